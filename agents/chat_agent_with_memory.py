@@ -3,8 +3,10 @@
 # ============================================================
 
 # agents/chat_agent_with_memory.py
-import json
+import orjson
 import asyncio
+import concurrent.futures
+from functools import lru_cache
 from typing import Dict, Any, Optional
 from database.connection import get_db
 from services.memory_service import MemoryService
@@ -28,6 +30,179 @@ import logging
 logger = logging.getLogger(__name__)
 
 
+# Entity extraction patterns fused into a single alternation, compiled
+# once at import time: one linear scan over the message instead of five
+# independent searches (and no per-pattern case-folded copies of the
+# message). GSTIN precedes PAN so the longer pattern wins where they
+# could overlap.
+_ENTITY_RE = re.compile(
+    r"(?P<gstin>\b\d{2}[A-Z]{5}\d{4}[A-Z]{1}[A-Z\d]{1}[Z]{1}[A-Z\d]{1}\b)"
+    r"|(?P<pan>\b[A-Z]{5}[0-9]{4}[A-Z]\b)"
+    r"|(?P<phone>\b(?:\+91[\s-]?)?[6-9]\d{9}\b)"
+    r"|(?P<email>\b[\w\.-]+@[\w\.-]+\.\w+\b)"
+    r"|(?P<amount>(?:₹|Rs\.?|INR)\s*(?P<amount_value>\d+(?:,\d+)*(?:\.\d+)?))",
+    re.IGNORECASE
+)
+
+# Intent keywords fused into a single alternation so detect_intent scans
+# the message once instead of once per keyword. Dict order encodes the
+# original if/elif precedence (file_gst outranks process_invoice even if
+# "invoice" appears earlier in the message).
+_INTENT_KEYWORDS = {
+    "file_gst": ("file gst", "gstr", "gst return"),
+    "file_itr": ("file itr", "income tax", "return filing"),
+    "process_invoice": ("invoice", "bill"),
+    "bookkeeping": ("bookkeeping", "entries", "ledger"),
+    "capital_gains": ("capital gain", "investment", "stock"),
+    "tax_planning": ("tax planning", "tax saving", "deduction"),
+}
+_INTENT_RE = re.compile(
+    "|".join(
+        f"(?P<{name}>{'|'.join(map(re.escape, keywords))})"
+        for name, keywords in _INTENT_KEYWORDS.items()
+    ),
+    re.IGNORECASE
+)
+_INTENT_NAMES = tuple(_INTENT_KEYWORDS)
+_INTENT_RANK = {name: rank for rank, name in enumerate(_INTENT_NAMES)}
+
+
+# Intent and entities depend only on the exact message text, and short
+# messages ("hi", "status?") recur across users - cache the NLP work
+@lru_cache(maxsize=4096)
+def _detect_intent_cached(message: str) -> str:
+    # Still one scan of the message, but the leftmost match doesn't win:
+    # of all keyword hits, keep the highest-precedence intent
+    best = None
+    for match in _INTENT_RE.finditer(message):
+        rank = _INTENT_RANK[match.lastgroup]
+        if best is None or rank < best:
+            best = rank
+            if rank == 0:
+                break
+    return "chat" if best is None else _INTENT_NAMES[best]
+
+
+@lru_cache(maxsize=4096)
+def _extract_entities_cached(message: str) -> tuple:
+    """Returns entities as a tuple of items so the cached value is immutable"""
+    entities = {}
+
+    # Single pass over the message; first hit wins per entity kind.
+    # Case folding happens only on the matched slices below - never on
+    # the whole message.
+    for match in _ENTITY_RE.finditer(message):
+        kind = match.lastgroup
+        if kind == "amount":
+            entities.setdefault("mentioned_amount", match.group("amount_value"))
+        elif kind in ("pan", "gstin"):
+            entities.setdefault(kind, match.group().upper())
+        elif kind == "email":
+            entities.setdefault("email", match.group().lower())
+        else:  # phone
+            entities.setdefault("phone", match.group())
+
+    return tuple(entities.items())
+
+
+# Long-running tools (the CrewAI-backed filing flow) get a dedicated
+# process pool so their GIL-holding work can't starve the small shared
+# thread pool that quick tools run on. Shared with the filing endpoint
+# in main.py, which submits whole filing runs to the same pool
+_LONG_RUNNING_TOOLS = {"trigger_auto_itr_filing"}
+CREW_POOL = concurrent.futures.ProcessPoolExecutor(max_workers=4)
+
+
+def _run_tool_in_worker(tool_name: str, args: Dict[str, Any]) -> str:
+    """
+    Resolve and run a tool by name. Module-level (and name-based) so it
+    pickles cleanly into the worker process.
+    """
+    from tools import api_tools
+
+    tool_obj = getattr(api_tools, tool_name)
+    if hasattr(tool_obj, "run"):
+        return tool_obj.run(**args)
+    return tool_obj(**args)
+
+
+class _ActionStreamParser:
+    """
+    Detects an `ACTION: {...}` block incrementally while response chunks
+    stream in, so the tool call can be dispatched as soon as the JSON
+    object closes instead of regex-scanning the full response afterwards.
+    """
+
+    _MARKER = "ACTION:"
+
+    def __init__(self):
+        self._tail = ""
+        self._json_chars = None   # None until the marker is seen
+        self._started = False     # True once the opening brace is seen
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self.done = False
+
+    def feed(self, chunk: str) -> Optional[str]:
+        """Feed a streamed chunk; returns the JSON payload once it balances"""
+        if self.done:
+            return None
+
+        while chunk:
+            if self._json_chars is None:
+                self._tail += chunk
+                idx = self._tail.find(self._MARKER)
+                if idx == -1:
+                    # Keep just enough to match a marker split across chunks
+                    self._tail = self._tail[-(len(self._MARKER) - 1):]
+                    return None
+                chunk = self._tail[idx + len(self._MARKER):]
+                self._tail = ""
+                self._json_chars = []
+
+            resume_at = None
+            for i, ch in enumerate(chunk):
+                if not self._started:
+                    if ch.isspace():
+                        continue
+                    if ch != "{":
+                        # Prose that merely mentions "ACTION:" - fall
+                        # back to marker search from here; a real block
+                        # may still follow later in the stream
+                        self._json_chars = None
+                        resume_at = i
+                        break
+                    self._started = True
+
+                self._json_chars.append(ch)
+
+                # Track string/escape state so braces inside strings don't
+                # affect the depth counter
+                if self._in_string:
+                    if self._escaped:
+                        self._escaped = False
+                    elif ch == "\\":
+                        self._escaped = True
+                    elif ch == '"':
+                        self._in_string = False
+                elif ch == '"':
+                    self._in_string = True
+                elif ch == "{":
+                    self._depth += 1
+                elif ch == "}":
+                    self._depth -= 1
+                    if self._depth == 0:
+                        self.done = True
+                        return "".join(self._json_chars)
+
+            if resume_at is None:
+                return None
+            chunk = chunk[resume_at:]
+
+        return None
+
+
 class ChatAgentWithMemory:
     """
     Enhanced Chat Agent with Short-term and Long-term Memory
@@ -60,11 +235,109 @@ RULES:
 
 Keep responses concise and professional."""
 
+    # Built once at class definition instead of per tool dispatch
+    _TOOL_MAP = {
+        "trigger_auto_itr_filing": trigger_auto_itr_filing,
+        "get_itr_status": get_itr_status,
+        "get_portfolio": get_portfolio,
+        "add_transaction": add_transaction,
+        "request_document": request_document,
+        "delete_transaction": delete_transaction,
+        "delete_filing": delete_filing
+    }
+
     def __init__(self, llm_client: OpenAIClient):
         self.llm = llm_client
         self.demographics_extractor = DemographicsExtractor(llm_client)
+        # Strong references to in-flight background tasks - the event
+        # loop alone holds only weak ones, so without this a
+        # fire-and-forget task can be GC'd mid-flight. Each task
+        # removes itself on completion; aclose() drains the rest.
+        self._background_tasks: set = set()
+
+    # ------------------------------------------------------------------
+    # Blocking DB phases - run via asyncio.to_thread so the sync
+    # SQLAlchemy round-trips never block the event loop
+    # ------------------------------------------------------------------
+
+    def _prepare_turn(self, user_id: str, session_id: str, message: str):
+        """Ensure session, read context, and stage the user message"""
+        with get_db() as db:
+            memory_service = MemoryService(db)
+
+            session = memory_service.get_or_create_session(user_id, session_id)
+
+            # Get context + summary in one pass, before staging the new
+            # message; the session row in hand saves the stamp lookup
+            bundle = memory_service.get_context_bundle(user_id, session_id, session=session)
+            context = bundle["context"]
+            context_summary = bundle["summary"]
+
+            # Stage user message; get_db commits on exit
+            memory_service.stage_message(
+                session_id=session_id,
+                role=MessageRole.USER,
+                content=message
+            )
+
+        return context, context_summary
+
+    def _persist_turn(
+        self,
+        user_id: str,
+        session_id: str,
+        response_text: str,
+        intent: Optional[str],
+        entities: Optional[Dict[str, Any]]
+    ):
+        """Persist the assistant turn (message, intent, entities) in one transaction"""
+        with get_db() as db:
+            memory_service = MemoryService(db)
+
+            memory_service.stage_message(
+                session_id=session_id,
+                role=MessageRole.ASSISTANT,
+                content=response_text,
+                intent=intent,
+                entities=entities
+            )
+
+            if intent or entities:
+                memory_service.stage_memory_deltas(
+                    user_id,
+                    intents={intent: 1} if intent else None,
+                    entities=entities or None
+                )
+
+            # get_db commits the whole turn on exit
+
+    def _store_demographics(self, user_id: str, demographics: Dict[str, Any]):
+        """Write extracted demographics in a short-lived session"""
+        with get_db() as db:
+            MemoryService(db).update_demographics(user_id, demographics)
+
+    async def _run_demographics_update(
+        self,
+        user_id: str,
+        recent_messages: list,
+        existing_demographics: Dict[str, Any]
+    ):
+        """Background demographics extraction; runs after the response is sent"""
+        try:
+            new_demographics = await self.demographics_extractor.extract_demographics(
+                recent_messages,
+                existing_demographics
+            )
+
+            if new_demographics:
+                await asyncio.to_thread(
+                    self._store_demographics, user_id, new_demographics
+                )
+                logger.info(f"Extracted demographics for {user_id}: {new_demographics}")
+        except Exception as e:
+            logger.error(f"Demographics extraction failed: {str(e)}")
+
 
-    
     async def chat(
         self,
         user_id: str,
@@ -84,71 +357,45 @@ Keep responses concise and professional."""
         Returns:
             Response with intent, entities, and bot reply
         """
-        with get_db() as db:
-            memory_service = MemoryService(db)
-            
-            # Ensure session exists
-            session = memory_service.get_or_create_session(user_id, session_id)
-            
-            # Store user message
-            memory_service.add_message(
-                session_id=session_id,
-                role=MessageRole.USER,
-                content=message
-            )
-            
-            # Get full context (short + long term memory)
-            context = memory_service.get_full_context(user_id, session_id)
-            context_summary = memory_service.get_context_summary(user_id, session_id)
-            
-            # Prepare system prompt with context
-            system_prompt = self.SYSTEM_PROMPT_TEMPLATE.format(
-                context_summary=context_summary
-            )
-            
-            # Get conversation history
-            history = context["conversation_history"]
-            
-            # Generate response
-            response_text = await self.llm.generate_with_history(
-                message=message,
-                history=history[:-1],  # Exclude the message we just added
-                system_prompt=system_prompt
-            )
-            
-            # Detect intent
-            intent = await self.detect_intent(message)
-            
-            # Extract entities if needed
-            entities = None
-            if detect_entities:
-                entities = await self.extract_entities(message, context["entities"])
-                
-                # Store entities in long-term memory
-                if entities:
-                    for key, value in entities.items():
-                        memory_service.add_entity(user_id, key, value)
-            
-            # Store assistant response
-            memory_service.add_message(
-                session_id=session_id,
-                role=MessageRole.ASSISTANT,
-                content=response_text,
-                intent=intent,
-                entities=entities
-            )
-            
-            # Track intent in long-term memory
-            if intent:
-                memory_service.track_intent(user_id, intent)
-            
-            return {
-                "response": response_text,
-                "intent": intent,
-                "entities": entities,
-                "context": context,
-                "requires_action": intent not in ["chat", "general_query"]
-            }
+        # Phase 1 (threaded): ensure session, read context, store user msg
+        context, context_summary = await asyncio.to_thread(
+            self._prepare_turn, user_id, session_id, message
+        )
+
+        # Prepare system prompt with context
+        system_prompt = self.SYSTEM_PROMPT_TEMPLATE.format(
+            context_summary=context_summary
+        )
+
+        # Get conversation history
+        history = context["conversation_history"]
+
+        # Intent/entity extraction is pure in-memory string work, so it
+        # runs inline before the LLM round-trip
+        intent = self.detect_intent(message)
+        entities = None
+        if detect_entities:
+            entities = self.extract_entities(message, context["entities"])
+
+        # Generate response
+        response_text = await self.llm.generate_with_history(
+            message=message,
+            history=history,
+            system_prompt=system_prompt
+        )
+
+        # Phase 2 (threaded): persist the assistant turn in one transaction
+        await asyncio.to_thread(
+            self._persist_turn, user_id, session_id, response_text, intent, entities
+        )
+
+        return {
+            "response": response_text,
+            "intent": intent,
+            "entities": entities,
+            "context": context,
+            "requires_action": intent not in ["chat", "general_query"]
+        }
     
     async def chat_stream(
         self,
@@ -158,200 +405,144 @@ Keep responses concise and professional."""
     ):
         """
         Stream response with memory context
+
+        Uses two short DB sessions (persist user message + read context,
+        then persist the assistant turn), both run off the event loop, so
+        no pooled connection sits idle for the seconds the LLM stream
+        takes and no DB round-trip blocks other coroutines.
         """
-        with get_db() as db:
-            memory_service = MemoryService(db)
-            
-            # Ensure session exists
-            session = memory_service.get_or_create_session(user_id, session_id)
-            
-            # Store user message
-            memory_service.add_message(
-                session_id=session_id,
-                role=MessageRole.USER,
-                content=message
-            )
-            
-            # Get context
-            context = memory_service.get_full_context(user_id, session_id)
-            context_summary = memory_service.get_context_summary(user_id, session_id)
-            
-            # Prepare system prompt
-            system_prompt = self.SYSTEM_PROMPT_TEMPLATE.format(
-                context_summary=context_summary
-            )
-            
-            # Get history
-            history = context["conversation_history"]
-            
-            # Stream response
-            full_response = ""
-            async for chunk in self.llm.generate_stream(
-                user_message=message,
-                history=history[:-1],
-                system_prompt=system_prompt
-            ):
-                full_response += chunk
-                yield chunk
-            
-            # Check for ACTION
-            action_match = re.search(r'ACTION:\s*(\{.*\})', full_response, re.DOTALL)
-            if action_match:
+        # Phase 1 (threaded): ensure session, read context, store user msg
+        context, context_summary = await asyncio.to_thread(
+            self._prepare_turn, user_id, session_id, message
+        )
+
+        # Prepare system prompt
+        system_prompt = self.SYSTEM_PROMPT_TEMPLATE.format(
+            context_summary=context_summary
+        )
+
+        # Get history
+        history = context["conversation_history"]
+
+        # Intent/entity extraction is cheap sync work; do it up front
+        intent = self.detect_intent(message)
+        entities = self.extract_entities(message, context["entities"])
+
+        # Stream response with no DB connection held, watching for an
+        # ACTION block as chunks arrive so the tool runs as soon as its
+        # JSON closes
+        full_response = ""
+        action_parser = _ActionStreamParser()
+        async for chunk in self.llm.generate_stream(
+            user_message=message,
+            history=history,
+            system_prompt=system_prompt
+        ):
+            full_response += chunk
+            yield chunk
+
+            action_json = action_parser.feed(chunk)
+            if action_json:
                 try:
-                    json_str = action_match.group(1)
-                    # Clean up JSON string if needed (sometimes LLM adds extra text)
-                    # Find the last closing brace
-                    last_brace = json_str.rfind('}')
-                    if last_brace != -1:
-                        json_str = json_str[:last_brace+1]
-                    
-                    action_data = json.loads(json_str)
+                    action_data = orjson.loads(action_json)
                     tool_name = action_data.get("tool")
                     args = action_data.get("args", {})
-                    
+
                     # Execute tool
                     result = await self.execute_tool(tool_name, args)
-                    
+
                     # Yield result
                     output = f"\n\n**System Action**: Executing `{tool_name}`...\n\n> {result}"
                     yield output
                     full_response += output
-                    
+
                 except Exception as e:
                     error_msg = f"\n\n[System Error]: Failed to execute action. {str(e)}"
                     yield error_msg
                     full_response += error_msg
-            
-            # After streaming complete, store assistant response
-            intent = await self.detect_intent(message)
-            entities = await self.extract_entities(message, context["entities"])
-            
-            memory_service.add_message(
-                session_id=session_id,
-                role=MessageRole.ASSISTANT,
-                content=full_response,
-                intent=intent,
-                entities=entities
+
+        # Phase 2 (threaded): persist the assistant turn in a second
+        # short-lived session
+        await asyncio.to_thread(
+            self._persist_turn, user_id, session_id, full_response, intent, entities
+        )
+
+        # Extract demographics from recent conversation (every 5 messages).
+        # Fire-and-forget: the LLM extraction must not delay closing the
+        # stream to the client.
+        message_count = len(context["conversation_history"])
+        if message_count % 5 == 0:  # Extract every 5 messages
+            recent_messages = context["conversation_history"][-10:]  # Last 10 messages
+            existing_demographics = context.get("demographics", {})
+
+            task = asyncio.create_task(
+                self._run_demographics_update(
+                    user_id, recent_messages, existing_demographics
+                )
             )
-            
-            if intent:
-                memory_service.track_intent(user_id, intent)
-            
-            if entities:
-                for key, value in entities.items():
-                    memory_service.add_entity(user_id, key, value)
-            
-            # Extract demographics from recent conversation (every 5 messages)
-            message_count = len(context["conversation_history"])
-            if message_count % 5 == 0:  # Extract every 5 messages
-                recent_messages = context["conversation_history"][-10:]  # Last 10 messages
-                existing_demographics = context.get("demographics", {})
-                
-                try:
-                    new_demographics = await self.demographics_extractor.extract_demographics(
-                        recent_messages,
-                        existing_demographics
-                    )
-                    
-                    if new_demographics:
-                        memory_service.update_demographics(user_id, new_demographics)
-                        logger.info(f"Extracted demographics for {user_id}: {new_demographics}")
-                except Exception as e:
-                    logger.error(f"Demographics extraction failed: {str(e)}")
+            self._background_tasks.add(task)
+            task.add_done_callback(self._background_tasks.discard)
+
+    async def aclose(self, timeout: float = 10.0):
+        """
+        Wait for in-flight background tasks at shutdown; anything still
+        running after the timeout is cancelled so shutdown can't hang
+        on a stuck LLM call.
+        """
+        if not self._background_tasks:
+            return
+        pending = tuple(self._background_tasks)
+        _, still_running = await asyncio.wait(pending, timeout=timeout)
+        for task in still_running:
+            task.cancel()
 
 
     async def execute_tool(self, tool_name: str, args: Dict[str, Any]) -> str:
         """Execute a tool by name (async wrapper)"""
-        tool_map = {
-            "trigger_auto_itr_filing": trigger_auto_itr_filing,
-            "get_itr_status": get_itr_status,
-            "get_portfolio": get_portfolio,
-            "add_transaction": add_transaction,
-            "request_document": request_document,
-            "delete_transaction": delete_transaction,
-            "delete_filing": delete_filing
-        }
-        
-        if tool_name not in tool_map:
+        tool_obj = self._TOOL_MAP.get(tool_name)
+        if tool_obj is None:
             return f"Error: Unknown tool {tool_name}"
-        
-        tool_obj = tool_map[tool_name]
-        
+
         try:
+            # Long-running crew tools run in their own process pool;
+            # everything else stays on the default thread pool
+            if tool_name in _LONG_RUNNING_TOOLS:
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(
+                    CREW_POOL, _run_tool_in_worker, tool_name, args
+                )
+
             # Define helper for sync execution
             def run_sync():
                 if hasattr(tool_obj, "run"):
                     return tool_obj.run(**args)
                 else:
                     return tool_obj(**args)
-            
-            # Run in thread pool to avoid blocking event loop
-            loop = asyncio.get_running_loop()
-            return await loop.run_in_executor(None, run_sync)
-            
+
+            # Run in a thread to avoid blocking event loop
+            return await asyncio.to_thread(run_sync)
+
         except Exception as e:
             return f"Error executing {tool_name}: {str(e)}"
     
-    async def detect_intent(self, message: str) -> str:
-        """Detect user intent from message"""
-        message_lower = message.lower()
-        
-        # Intent mapping
-        if any(keyword in message_lower for keyword in ["file gst", "gstr", "gst return"]):
-            return "file_gst"
-        elif any(keyword in message_lower for keyword in ["file itr", "income tax", "return filing"]):
-            return "file_itr"
-        elif any(keyword in message_lower for keyword in ["invoice", "bill"]):
-            return "process_invoice"
-        elif any(keyword in message_lower for keyword in ["bookkeeping", "entries", "ledger"]):
-            return "bookkeeping"
-        elif any(keyword in message_lower for keyword in ["capital gain", "investment", "stock"]):
-            return "capital_gains"
-        elif any(keyword in message_lower for keyword in ["tax planning", "tax saving", "deduction"]):
-            return "tax_planning"
-        
-        return "chat"
+    def detect_intent(self, message: str) -> str:
+        """Detect user intent from message (pure string work, no I/O)"""
+        return _detect_intent_cached(message)
     
-    async def extract_entities(
+    def extract_entities(
         self,
         message: str,
         existing_entities: Dict[str, Any]
     ) -> Optional[Dict[str, Any]]:
         """
         Extract important entities from message
-        Uses LLM for better extraction
+        Regex-only today, so kept synchronous; reintroduce async only if
+        this grows an LLM call
         """
-        # Simple regex-based extraction (can be enhanced with LLM)
-        import re
-        
-        entities = {}
-        
-        # PAN pattern
-        pan_match = re.search(r'\b[A-Z]{5}[0-9]{4}[A-Z]\b', message.upper())
-        if pan_match:
-            entities["pan"] = pan_match.group()
-        
-        # GSTIN pattern
-        gstin_match = re.search(r'\b\d{2}[A-Z]{5}\d{4}[A-Z]{1}[A-Z\d]{1}[Z]{1}[A-Z\d]{1}\b', message.upper())
-        if gstin_match:
-            entities["gstin"] = gstin_match.group()
-        
-        # Phone number
-        phone_match = re.search(r'\b(\+91[\s-]?)?[6-9]\d{9}\b', message)
-        if phone_match:
-            entities["phone"] = phone_match.group()
-        
-        # Email
-        email_match = re.search(r'\b[\w\.-]+@[\w\.-]+\.\w+\b', message.lower())
-        if email_match:
-            entities["email"] = email_match.group()
-        
-        # Amount (₹ or Rs)
-        amount_match = re.search(r'(?:₹|Rs\.?|INR)\s*(\d+(?:,\d+)*(?:\.\d+)?)', message)
-        if amount_match:
-            entities["mentioned_amount"] = amount_match.group(1)
-        
-        return entities if entities else None
+        # Rebuild a fresh dict from the cached tuple so callers never
+        # share mutable state
+        items = _extract_entities_cached(message)
+        return dict(items) if items else None
     
     async def update_user_profile(self, user_id: str):
         """
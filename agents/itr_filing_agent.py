@@ -3,31 +3,107 @@ ITR Filing Agent using CrewAI
 Primary responsibility: Automatically file ITR using mock APIs
 """
 
-from crewai import Agent, Task, Crew, Process
-from langchain_openai import ChatOpenAI
 from utils.config import settings
-from tools.itr_tools import (
-    itr_login_tool,
-    add_client_tool,
-    get_prefill_data_tool,
-    validate_itr_tool,
-    save_draft_tool,
-    set_verification_mode_tool,
-    submit_itr_tool,
-    get_acknowledgement_tool
-)
-
-# Initialize LLM
-llm = ChatOpenAI(
-    model="gpt-4o",
-    api_key=settings.OPENAI_API_KEY
-)
+
+
+def _import_crew_deps():
+    """
+    Deferred import of crewai / langchain_openai (and the tool modules
+    that pull them in). These cost hundreds of ms at import time, so
+    processes that never touch ITR filing shouldn't pay for them.
+    """
+    global Agent, Task, Crew, Process, ChatOpenAI
+    global itr_login_tool, add_client_tool, get_prefill_data_tool, \
+        add_client_and_prefill_tool, validate_itr_tool, save_draft_tool, \
+        set_verification_mode_tool, submit_itr_tool, get_acknowledgement_tool
+
+    from crewai import Agent, Task, Crew, Process
+    from langchain_openai import ChatOpenAI
+    from tools.itr_tools import (
+        itr_login_tool,
+        add_client_tool,
+        get_prefill_data_tool,
+        add_client_and_prefill_tool,
+        validate_itr_tool,
+        save_draft_tool,
+        set_verification_mode_tool,
+        submit_itr_tool,
+        get_acknowledgement_tool
+    )
 
 
 class ITRFilingCrew:
     """CrewAI setup for automated ITR filing"""
-    
+
+    # Task skeleton for automated filing: (description template, agent
+    # attribute, expected output, indices of context tasks). Descriptions
+    # are interpolated per call; Tasks and Crew are built once in __init__
+    # since CrewAI does non-trivial setup (tool schema registration,
+    # agent binding) per Crew.
+    _FILING_TASK_SPECS = [
+        ("""
+            1. Login to ITR system using itr_login_tool
+            2. Store the session ID for subsequent API calls
+            3. Add the client (PAN: {pan}) for assessment year {assessment_year}
+               and fetch their prefill data in one step using
+               add_client_and_prefill_tool (the two calls run concurrently)
+            4. Confirm successful client addition
+            """,
+         "itr_agent", "Session ID, Client Reference ID, and prefill data", []),
+        ("""
+            Using the session ID from the previous task:
+            1. Fetch prefill data for PAN: {pan}, AY: {assessment_year}
+            2. Extract salary information, TDS details, and deductions
+            3. Summarize the key income and tax information
+            """,
+         "data_analyst", "Prefilled ITR data with income and tax details", [0]),
+        ("""
+            Using the prefill data and session ID:
+            1. Review the prefilled data for accuracy
+            2. Ensure all mandatory fields are present
+            3. Validate the ITR using validate_itr_tool
+            4. If validation fails, identify and report errors
+            5. If validation succeeds, proceed with the validation ID
+
+            ITR Type: {itr_type}
+            """,
+         "validator", "Validation ID or list of errors", [0, 1]),
+        ("""
+            Using the validation ID:
+            1. Save the validated ITR as a draft using save_draft_tool
+            2. Set the verification mode to 'eVerify Later'
+            3. Confirm draft is ready for submission
+            """,
+         "itr_agent", "Draft ID and verification mode confirmation", [0, 2]),
+        ("""
+            Final submission:
+            1. Submit the ITR using submit_itr_tool with the draft ID
+            2. Capture the acknowledgement number
+            3. Retrieve the acknowledgement using get_acknowledgement_tool
+            4. Provide a complete summary of the filing
+            """,
+         "itr_agent", "Acknowledgement number and submission confirmation", [0, 3]),
+    ]
+
     def __init__(self):
+        _import_crew_deps()
+        import httpx
+
+        # One pooled HTTP client shared by all three agents, so the crew's
+        # many sequential LLM calls reuse TCP/TLS connections instead of
+        # handshaking per request; HTTP/2 multiplexes them on one socket
+        self._http_client = httpx.Client(
+            http2=True,
+            limits=httpx.Limits(max_keepalive_connections=50, max_connections=200)
+        )
+
+        # Initialize LLM (constructed lazily with the crew, not at import)
+        self.llm = ChatOpenAI(
+            model="gpt-4o",
+            api_key=settings.OPENAI_API_KEY,
+            http_client=self._http_client
+        )
+
         # ITR Filing Agent
         self.itr_agent = Agent(
             role='ITR Filing Specialist',
@@ -39,11 +115,12 @@ class ITRFilingCrew:
             of steps and handle errors gracefully.""",
             verbose=True,
             allow_delegation=False,
-            llm=llm,
+            llm=self.llm,
             tools=[
                 itr_login_tool,
                 add_client_tool,
                 get_prefill_data_tool,
+                add_client_and_prefill_tool,
                 validate_itr_tool,
                 save_draft_tool,
                 set_verification_mode_tool,
@@ -62,7 +139,7 @@ class ITRFilingCrew:
             deductions, and how to optimize tax liability legally.""",
             verbose=True,
             allow_delegation=False,
-            llm=llm
+            llm=self.llm
         )
         
         # Validator Agent
@@ -74,9 +151,27 @@ class ITRFilingCrew:
             submission and ensure all mandatory fields are filled correctly.""",
             verbose=True,
             allow_delegation=False,
-            llm=llm
+            llm=self.llm
         )
-    
+
+        # Build the filing crew once and reuse it across requests
+        self._filing_tasks = []
+        for description, agent_attr, expected_output, context_idx in self._FILING_TASK_SPECS:
+            task = Task(
+                description=description,
+                agent=getattr(self, agent_attr),
+                expected_output=expected_output,
+                context=[self._filing_tasks[i] for i in context_idx]
+            )
+            self._filing_tasks.append(task)
+
+        self._filing_crew = Crew(
+            agents=[self.itr_agent, self.data_analyst, self.validator],
+            tasks=self._filing_tasks,
+            verbose=True,
+            process=Process.sequential
+        )
+
     def file_itr_automatically(
         self,
         user_id: str,
@@ -87,97 +182,29 @@ class ITRFilingCrew:
     ) -> str:
         """
         Automatically file ITR for a user
-        
+
         Args:
             user_id: User ID
             pan: PAN number
             assessment_year: Assessment year (e.g., "2024-25")
             itr_type: ITR form type
             include_prefill: Whether to use government prefill data
-        
+
         Returns:
             Filing result with acknowledgement number
         """
-        
-        # Task 1: Login and Authentication
-        login_task = Task(
-            description=f"""
-            1. Login to ITR system using itr_login_tool
-            2. Store the session ID for subsequent API calls
-            3. Add the client (PAN: {pan}) for assessment year {assessment_year}
-            4. Confirm successful client addition
-            """,
-            agent=self.itr_agent,
-            expected_output="Session ID and Client Reference ID"
-        )
-        
-        # Task 2: Fetch Prefill Data
-        prefill_task = Task(
-            description=f"""
-            Using the session ID from the previous task:
-            1. Fetch prefill data for PAN: {pan}, AY: {assessment_year}
-            2. Extract salary information, TDS details, and deductions
-            3. Summarize the key income and tax information
-            """,
-            agent=self.data_analyst,
-            expected_output="Prefilled ITR data with income and tax details",
-            context=[login_task]
-        )
-        
-        # Task 3: Prepare and Validate ITR Data
-        validation_task = Task(
-            description=f"""
-            Using the prefill data and session ID:
-            1. Review the prefilled data for accuracy
-            2. Ensure all mandatory fields are present
-            3. Validate the ITR using validate_itr_tool
-            4. If validation fails, identify and report errors
-            5. If validation succeeds, proceed with the validation ID
-            
-            ITR Type: {itr_type}
-            """,
-            agent=self.validator,
-            expected_output="Validation ID or list of errors",
-            context=[login_task, prefill_task]
-        )
-        
-        # Task 4: Save Draft and Set Verification Mode
-        draft_task = Task(
-            description="""
-            Using the validation ID:
-            1. Save the validated ITR as a draft using save_draft_tool
-            2. Set the verification mode to 'eVerify Later'
-            3. Confirm draft is ready for submission
-            """,
-            agent=self.itr_agent,
-            expected_output="Draft ID and verification mode confirmation",
-            context=[login_task, validation_task]
-        )
-        
-        # Task 5: Submit ITR
-        submission_task = Task(
-            description="""
-            Final submission:
-            1. Submit the ITR using submit_itr_tool with the draft ID
-            2. Capture the acknowledgement number
-            3. Retrieve the acknowledgement using get_acknowledgement_tool
-            4. Provide a complete summary of the filing
-            """,
-            agent=self.itr_agent,
-            expected_output="Acknowledgement number and submission confirmation",
-            context=[login_task, draft_task]
-        )
-        
-        # Create and run the crew
-        crew = Crew(
-            agents=[self.itr_agent, self.data_analyst, self.validator],
-            tasks=[login_task, prefill_task, validation_task, draft_task, submission_task],
-            verbose=True,
-            process=Process.sequential
-        )
-        
-        result = crew.kickoff()
-        
+
+        # Interpolate the per-call parameters into the cached crew's task
+        # descriptions instead of rebuilding Tasks and Crew every request
+        for task, (template, _, _, _) in zip(self._filing_tasks, self._FILING_TASK_SPECS):
+            task.description = template.format(
+                pan=pan,
+                assessment_year=assessment_year,
+                itr_type=itr_type
+            )
+
+        result = self._filing_crew.kickoff()
+
         return str(result)
     
     def get_itr_status(self, pan: str, assessment_year: str) -> str:
@@ -243,3 +270,24 @@ class ITRFilingCrew:
         
         result = crew.kickoff()
         return str(result)
+
+
+# Per-process crew for pool workers; built on first use so forking the
+# pool doesn't pay the agent construction cost up front
+_worker_crew = None
+
+
+def run_filing_in_worker(user_id: str, pan: str, assessment_year: str, itr_type: str) -> str:
+    """
+    Run a full filing in a pool worker process. Module-level so it
+    pickles by name; the crew is built once per worker and reused.
+    """
+    global _worker_crew
+    if _worker_crew is None:
+        _worker_crew = ITRFilingCrew()
+    return _worker_crew.file_itr_automatically(
+        user_id=user_id,
+        pan=pan,
+        assessment_year=assessment_year,
+        itr_type=itr_type
+    )
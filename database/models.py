@@ -1,5 +1,7 @@
-from sqlalchemy import Column, String, Integer, Float, DateTime, JSON, Boolean, ForeignKey, Text, Enum as SQLEnum, Index
+from sqlalchemy import Column, String, Integer, Float, DateTime, Boolean, ForeignKey, Text, Enum as SQLEnum, Index, text
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.ext.declarative import declarative_base
+from pgvector.sqlalchemy import Vector
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import enum
@@ -38,8 +40,10 @@ class User(Base):
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relationships
-    documents = relationship("Document", back_populates="user", cascade="all, delete-orphan")
-    itr_filings = relationship("ITRFiling", back_populates="user", cascade="all, delete-orphan")
+    # Hot collections load with selectin (one IN query per collection)
+    # so iterating users doesn't fire a SELECT per parent row
+    documents = relationship("Document", back_populates="user", cascade="all, delete-orphan", lazy='selectin')
+    itr_filings = relationship("ITRFiling", back_populates="user", cascade="all, delete-orphan", lazy='selectin')
     capital_gains = relationship("CapitalGains", back_populates="user", cascade="all, delete-orphan")
     conversation_sessions = relationship("ConversationSession", back_populates="user", cascade="all, delete-orphan")
     user_memory = relationship("UserMemory", back_populates="user", uselist=False, cascade="all, delete-orphan")
@@ -53,12 +57,21 @@ class Document(Base):
     file_name = Column(String, nullable=False)
     file_path = Column(String, nullable=False)
     file_size = Column(Integer, nullable=True)
-    extracted_data = Column(JSON, nullable=True)
+    sha256 = Column(String(64), nullable=True)  # Content digest for dedupe
+    extracted_data = Column(JSONB, nullable=True)
     uploaded_at = Column(DateTime, default=datetime.utcnow)
-    
+
     # Relationships
     user = relationship("User", back_populates="documents")
 
+    __table_args__ = (
+        Index('idx_doc_user_type', 'user_id', 'document_type'),
+        # A user re-uploading identical bytes maps to the existing row
+        Index('idx_doc_user_sha256', 'user_id', 'sha256', unique=True),
+        # Matches the listing order so it's a pre-sorted index scan
+        Index('idx_doc_user_uploaded', 'user_id', text('uploaded_at DESC')),
+    )
+
 class ITRFiling(Base):
     __tablename__ = "itr_filings"
     
@@ -68,17 +81,18 @@ class ITRFiling(Base):
     itr_type = Column(String, nullable=False)  # ITR-1, ITR-2, etc.
     status = Column(SQLEnum(ITRStatus), default=ITRStatus.DRAFT)
     
-    # Session IDs
+    # Session IDs (indexed: filings are looked up by these externally
+    # issued identifiers, which would otherwise force seq scans)
     session_id = Column(String, nullable=True)
-    client_reference_id = Column(String, nullable=True)
-    validation_id = Column(String, nullable=True)
-    draft_id = Column(String, nullable=True)
-    acknowledgement_number = Column(String, nullable=True)
+    client_reference_id = Column(String, nullable=True, index=True)
+    validation_id = Column(String, nullable=True, index=True)
+    draft_id = Column(String, nullable=True, index=True)
+    acknowledgement_number = Column(String, nullable=True, unique=True, index=True)
     
     # ITR Data
-    itr_data = Column(JSON, nullable=True)
-    prefill_data = Column(JSON, nullable=True)
-    validation_errors = Column(JSON, nullable=True)
+    itr_data = Column(JSONB, nullable=True)
+    prefill_data = Column(JSONB, nullable=True)
+    validation_errors = Column(JSONB, nullable=True)
     verification_mode = Column(String, nullable=True)
     
     # Timestamps
@@ -86,10 +100,17 @@ class ITRFiling(Base):
     validated_at = Column(DateTime, nullable=True)
     submitted_at = Column(DateTime, nullable=True)
     acknowledged_at = Column(DateTime, nullable=True)
-    
+
     # Relationships
     user = relationship("User", back_populates="itr_filings")
 
+    __table_args__ = (
+        Index('idx_itr_user_ay_status', 'user_id', 'assessment_year', 'status'),
+        # Pre-sorted scans for get_user_filings / get_latest_filing
+        Index('idx_itr_user_created', 'user_id', text('created_at DESC')),
+        Index('idx_itr_user_ay_created', 'user_id', 'assessment_year', text('created_at DESC')),
+    )
+
 class CapitalGains(Base):
     __tablename__ = "capital_gains"
     
@@ -126,6 +147,16 @@ class CapitalGains(Base):
     # Relationships
     user = relationship("User", back_populates="capital_gains")
 
+    __table_args__ = (
+        # Partial index: long-term rows are the hot filter, and indexing
+        # only those keeps the index small for a low-cardinality boolean
+        Index('idx_cg_user_longterm', 'user_id', postgresql_where=text('is_long_term IS TRUE')),
+        # get_transactions orders by purchase_date and optionally
+        # filters on asset_type
+        Index('idx_cg_user_purchase', 'user_id', text('purchase_date DESC')),
+        Index('idx_cg_user_asset', 'user_id', 'asset_type'),
+    )
+
 # ============================================================================
 # MEMORY MODELS (Short-term & Long-term)
 # ============================================================================
@@ -140,7 +171,16 @@ class ConversationSession(Base):
     # Session metadata
     title = Column(String, nullable=True)  # Auto-generated from first message
     is_active = Column(Boolean, default=True)
-    
+
+    # Denormalized message stats, maintained by stage_message, so
+    # session listings never join/aggregate the messages table
+    message_count = Column(Integer, default=0, nullable=False)
+    last_message_at = Column(DateTime, nullable=True)
+
+    # Per-session intent counts, bumped server-side on insert, so
+    # ending a session summarizes without scanning its messages
+    intent_histogram = Column(JSONB, nullable=True)  # {"tax_query": 3, ...}
+
     # Timestamps
     started_at = Column(DateTime, default=datetime.utcnow)
     last_activity = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -148,14 +188,21 @@ class ConversationSession(Base):
     
     # Summary for long-term memory
     session_summary = Column(Text, nullable=True)
-    key_intents = Column(JSON, nullable=True)  # ["file_gst", "tax_query", etc.]
+    key_intents = Column(JSONB, nullable=True)  # ["file_gst", "tax_query", etc.]
     
     # Relationships
     user = relationship("User", back_populates="conversation_sessions")
+    # Deliberately lazy: sessions are loaded on every chat turn and in
+    # listings, and nothing on those paths should drag the full message
+    # history along - the recent window and the denormalized stats
+    # cover them
     messages = relationship("Message", back_populates="session", cascade="all, delete-orphan", order_by="Message.created_at")
     
     __table_args__ = (
         Index('idx_user_active_sessions', 'user_id', 'is_active'),
+        # Session listings order by last_activity DESC; serve the sort
+        # from the index instead of a filesort
+        Index('idx_sessions_user_activity', 'user_id', text('last_activity DESC')),
     )
 
 class Message(Base):
@@ -172,10 +219,10 @@ class Message(Base):
     # Metadata
     token_count = Column(Integer, nullable=True)
     intent = Column(String, nullable=True)  # Detected intent
-    entities = Column(JSON, nullable=True)  # Extracted entities (dates, amounts, etc.)
+    entities = Column(JSONB, nullable=True)  # Extracted entities (dates, amounts, etc.)
     
-    # Embeddings for semantic search (stored as JSON array)
-    embedding = Column(JSON, nullable=True)
+    # Embeddings for semantic search (pgvector; queried via cosine_distance)
+    embedding = Column(Vector(768), nullable=True)
     
     # Timestamps
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -184,7 +231,19 @@ class Message(Base):
     session = relationship("ConversationSession", back_populates="messages")
     
     __table_args__ = (
-        Index('idx_session_messages', 'session_id', 'created_at'),
+        # Descending so get_recent_messages' created_at DESC LIMIT N
+        # walks the index head without a sort step
+        Index('idx_session_messages', 'session_id', text('created_at DESC')),
+        # GIN index for @> containment lookups on extracted entities;
+        # jsonb_path_ops is smaller and faster than the default opclass
+        Index('idx_message_entities_gin', 'entities',
+              postgresql_using='gin', postgresql_ops={'entities': 'jsonb_path_ops'}),
+        # ANN index so semantic retrieval is an index scan in SQL rather
+        # than deserializing every row and computing cosine in Python
+        Index('idx_message_embedding_hnsw', 'embedding',
+              postgresql_using='hnsw',
+              postgresql_ops={'embedding': 'vector_cosine_ops'},
+              postgresql_with={'m': 16, 'ef_construction': 64}),
     )
 
 class UserMemory(Base):
@@ -210,14 +269,14 @@ class UserMemory(Base):
     language_preference = Column(String, nullable=True)
     
     # Entity memory (important facts about user)
-    entities = Column(JSON, nullable=True)  # {"gstin": "...", "business_name": "...", etc.}
+    entities = Column(JSONB, nullable=True)  # {"gstin": "...", "business_name": "...", etc.}
     
     # Demographics (extracted from conversations)
-    demographics = Column(JSON, nullable=True)  # {"age": "...", "gender": "...", "occupation": "...", "location": "...", "marital_status": "...", etc.}
+    demographics = Column(JSONB, nullable=True)  # {"age": "...", "gender": "...", "occupation": "...", "location": "...", "marital_status": "...", etc.}
     
     # Conversation insights
-    frequent_intents = Column(JSON, nullable=True)  # ["file_gst", "tax_query", ...]
-    last_topics = Column(JSON, nullable=True)  # Recent topics discussed
+    frequent_intents = Column(JSONB, nullable=True)  # ["file_gst", "tax_query", ...]
+    last_topics = Column(JSONB, nullable=True)  # Recent topics discussed
     
     # Timestamps
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -226,3 +285,10 @@ class UserMemory(Base):
     
     # Relationships
     user = relationship("User", back_populates="user_memory")
+
+    __table_args__ = (
+        Index('idx_user_memory_entities_gin', 'entities',
+              postgresql_using='gin', postgresql_ops={'entities': 'jsonb_path_ops'}),
+        Index('idx_user_memory_intents_gin', 'frequent_intents',
+              postgresql_using='gin', postgresql_ops={'frequent_intents': 'jsonb_path_ops'}),
+    )
@@ -0,0 +1,27 @@
+"""
+Prebuilt statements for hot lookups.
+
+Constructing a Query/select() per call re-runs expression building on
+every request; these are built once at import and executed with bound
+parameters (SQL string compilation itself is memoized by the engine's
+compiled cache).
+"""
+
+from sqlalchemy import bindparam, desc, select
+
+from database.models import Document, User
+
+GET_USER_BY_ID = select(User).where(User.user_id == bindparam("uid"))
+
+GET_USER_DOCUMENTS = (
+    select(Document)
+    .where(Document.user_id == bindparam("uid"))
+    .order_by(desc(Document.uploaded_at))
+    .limit(bindparam("limit"))
+)
+
+# Keyset cursor variant: pages follow the same (user_id, uploaded_at
+# DESC) index, so each page costs O(limit) regardless of history size
+GET_USER_DOCUMENTS_AFTER = GET_USER_DOCUMENTS.where(
+    Document.uploaded_at < bindparam("after")
+)
@@ -1,24 +1,85 @@
 from fastapi import FastAPI, HTTPException, Header, Request
-from fastapi.responses import JSONResponse
-from pydantic import BaseModel, Field
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse, Response
+from pydantic import BaseModel, ConfigDict, TypeAdapter
 from typing import Optional, List, Dict, Any
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta
-import secrets
-import json
+import asyncio
+import hashlib
+import hmac
 import base64
+import os
+import time
 from enum import Enum
 
+import orjson
+
+# Sweep cadence and retention for entries that are only evicted lazily on
+# access; without a sweeper, never-revisited keys grow RSS unboundedly
+SWEEP_INTERVAL_SECONDS = 60
+STATE_TTL_SECONDS = 86400
+
+
+async def _sweep_expired():
+    """Periodically evict expired sessions, cache entries and stale state"""
+    while True:
+        await asyncio.sleep(SWEEP_INTERVAL_SECONDS)
+        now = time.time()
+
+        for key in [k for k, v in sessions.items() if v["expires"] < now]:
+            sessions.pop(key, None)
+        for key in [k for k, v in _prefill_cache.items() if v[0] < now]:
+            _prefill_cache.pop(key, None)
+        for key in [k for k, v in _idempotency_cache.items() if v[0] < now]:
+            _idempotency_cache.pop(key, None)
+
+        # Clients, validations, drafts and submissions keep ISO
+        # timestamps for API fidelity; comparing them once a minute in
+        # batch stays off the hot path
+        cutoff = (datetime.now() - timedelta(seconds=STATE_TTL_SECONDS)).isoformat()
+        for key in [k for k, v in clients.items() if v["addedAt"] < cutoff]:
+            clients.pop(key, None)
+        for key in [k for k, v in validations.items() if v["validatedAt"] < cutoff]:
+            validations.pop(key, None)
+        for key in [k for k, v in drafts.items() if v["savedAt"] < cutoff]:
+            drafts.pop(key, None)
+        for key in [k for k, v in submissions.items() if v["submittedAt"] < cutoff]:
+            submissions.pop(key, None)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    sweeper = asyncio.create_task(_sweep_expired())
+    yield
+    sweeper.cancel()
+
+
 app = FastAPI(
     title="ERI Type-2 Mock ITR API",
     description="Mock Government ITR APIs for testing ERI Type-2 integrations",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
+# Compress anything over ~0.5KB (the prefill payload in particular) when
+# the client advertises gzip; tiny bodies aren't worth the header overhead
+app.add_middleware(GZipMiddleware, minimum_size=500)
+
 # ============================================================================
 # MODELS
 # ============================================================================
 
-class AuthRequest(BaseModel):
+class StrictRequest(BaseModel):
+    """
+    Base for inbound payloads. Unknown fields are rejected in
+    pydantic-core's compiled validator rather than silently carried
+    around, and instances are frozen so they hash and never mutate.
+    """
+    model_config = ConfigDict(extra='forbid', frozen=True)
+
+class AuthRequest(StrictRequest):
     clientId: str
     clientSecret: str
     eriUserId: str
@@ -29,7 +90,7 @@ class AuthResponse(BaseModel):
     sessionId: str
     expiresIn: int
 
-class AddClientRequest(BaseModel):
+class AddClientRequest(StrictRequest):
     pan: str
     assessmentYear: str
 
@@ -37,11 +98,11 @@ class AddClientResponse(BaseModel):
     status: str
     clientReferenceId: str
 
-class PrefillRequest(BaseModel):
+class PrefillRequest(StrictRequest):
     pan: str
     assessmentYear: str
 
-class ValidationRequest(BaseModel):
+class ValidationRequest(StrictRequest):
     pan: str
     assessmentYear: str
     itrType: str
@@ -56,7 +117,7 @@ class ValidationResponse(BaseModel):
     validationId: Optional[str] = None
     errors: Optional[List[ValidationError]] = None
 
-class SaveDraftRequest(BaseModel):
+class SaveDraftRequest(StrictRequest):
     validationId: str
 
 class SaveDraftResponse(BaseModel):
@@ -68,14 +129,14 @@ class VerificationMode(str, Enum):
     EVERIFY_LATER = "eVerify Later"
     ITRV = "ITR-V"
 
-class VerificationModeRequest(BaseModel):
+class VerificationModeRequest(StrictRequest):
     draftId: str
     verificationMode: VerificationMode
 
 class VerificationModeResponse(BaseModel):
     status: str
 
-class SubmitITRRequest(BaseModel):
+class SubmitITRRequest(StrictRequest):
     draftId: str
     signedItrData: str
 
@@ -84,7 +145,7 @@ class SubmitITRResponse(BaseModel):
     acknowledgementNumber: str
     submissionDate: str
 
-class AcknowledgementRequest(BaseModel):
+class AcknowledgementRequest(StrictRequest):
     acknowledgementNumber: str
 
 class AcknowledgementResponse(BaseModel):
@@ -92,49 +153,134 @@ class AcknowledgementResponse(BaseModel):
     pdfUrl: str
     itrVAvailable: bool
 
-class RequestWrapper(BaseModel):
+class RequestWrapper(StrictRequest):
     data: str
     signature: str
 
+# Per-payload adapters: validate_json parses and validates the decoded
+# bytes in one pydantic-core pass, with no intermediate Python dict
+_auth_adapter = TypeAdapter(AuthRequest)
+_add_client_adapter = TypeAdapter(AddClientRequest)
+_prefill_adapter = TypeAdapter(PrefillRequest)
+_validation_adapter = TypeAdapter(ValidationRequest)
+_save_draft_adapter = TypeAdapter(SaveDraftRequest)
+_verification_adapter = TypeAdapter(VerificationModeRequest)
+_submit_adapter = TypeAdapter(SubmitITRRequest)
+_ack_adapter = TypeAdapter(AcknowledgementRequest)
+
 # ============================================================================
 # IN-MEMORY STORAGE (simulates session/database)
 # ============================================================================
 
+# Session expiry is stored as an epoch float so verify_session is a dict
+# lookup plus a float compare, with no datetime parsing per request
+SESSION_TTL_SECONDS = 86400
+
 sessions = {}
 clients = {}
 validations = {}
 drafts = {}
 submissions = {}
 
+# Exact-key response caches. Prefill data is identical for a given
+# (pan, AY) pair and validation outcomes for identical payloads, so
+# repeat calls skip dict construction and JSON encoding entirely.
+PREFILL_CACHE_TTL_SECONDS = 3600
+
+_prefill_cache = {}  # (pan, ay) -> (expires, serialized response body)
+
+# Validation outcomes carry no timestamp, so this cache is bounded by
+# size instead of the sweeper: FIFO-evicted at the cap (dicts iterate
+# in insertion order)
+VALIDATION_CACHE_MAX_ENTRIES = 1024
+
+_validation_cache = {}  # (itr_type, payload digest) -> (is_valid, errors)
+
+# Replayed submissions (client retries) short-circuit to the original
+# response instead of minting a fresh acknowledgement per attempt
+IDEMPOTENCY_TTL_SECONDS = 86400
+
+_idempotency_cache = {}  # Idempotency-Key -> (expires, original response)
+
 # ============================================================================
 # HELPER FUNCTIONS
 # ============================================================================
 
-def verify_signature(signature: str) -> bool:
-    """Mock signature verification - in real API, this validates DSC"""
-    return len(signature) > 20
+class TokenPool:
+    """
+    Batched CSPRNG buffer. secrets.token_* issues a getrandom(2) syscall
+    per call; slicing tokens out of a 4KB os.urandom refill amortizes
+    that syscall across hundreds of tokens. The server runs a single
+    event loop, so no locking is needed.
+    """
+
+    _REFILL_SIZE = 4096
+
+    def __init__(self):
+        self._buf = b""
+        self._pos = 0
+
+    def take(self, n: int) -> bytes:
+        if self._pos + n > len(self._buf):
+            self._buf = os.urandom(max(self._REFILL_SIZE, n))
+            self._pos = 0
+        chunk = self._buf[self._pos:self._pos + n]
+        self._pos += n
+        return chunk
+
+
+_token_pool = TokenPool()
+
+
+def token_urlsafe_fast(n: int = 32) -> str:
+    """Drop-in for secrets.token_urlsafe backed by the pooled buffer"""
+    return base64.urlsafe_b64encode(_token_pool.take(n)).rstrip(b'=').decode()
+
+
+def token_hex_fast(n: int) -> str:
+    """Drop-in for secrets.token_hex backed by the pooled buffer"""
+    return _token_pool.take(n).hex()
+
 
-def decode_wrapper(wrapper: RequestWrapper) -> dict:
-    """Decode and verify wrapped request"""
-    if not verify_signature(wrapper.signature):
+# Shared secret for the mock ERI channel; clients sign the base64 payload
+# with HMAC-SHA256 (hashlib dispatches to OpenSSL, which uses the CPU's
+# SHA extensions where available)
+SIGNING_SECRET = b"test_secret_123"
+
+
+def verify_signature(data: str, signature: str) -> bool:
+    """Verify the HMAC-SHA256 of the encoded payload in constant time"""
+    expected = hmac.new(SIGNING_SECRET, data.encode(), hashlib.sha256).digest()
+    try:
+        provided = bytes.fromhex(signature)
+    except ValueError:
+        return False
+    return hmac.compare_digest(expected, provided)
+
+def decode_wrapper(wrapper: RequestWrapper) -> bytes:
+    """Verify a wrapped request and return the raw payload bytes.
+
+    Parsing is left to the caller's TypeAdapter, which validates the
+    bytes in a single pass instead of json-parse-then-validate.
+    """
+    if not verify_signature(wrapper.data, wrapper.signature):
         raise HTTPException(status_code=401, detail="Invalid signature")
-    
+
     try:
-        decoded = base64.b64decode(wrapper.data).decode('utf-8')
-        return json.loads(decoded)
-    except:
+        return base64.b64decode(wrapper.data)
+    except Exception:
         raise HTTPException(status_code=400, detail="Invalid request format")
 
 def verify_session(session_id: Optional[str]) -> bool:
     """Verify session is valid"""
-    if not session_id or session_id not in sessions:
+    session = sessions.get(session_id) if session_id else None
+    if session is None:
         return False
-    
-    session = sessions[session_id]
-    if datetime.fromisoformat(session['expires']) < datetime.now():
-        del sessions[session_id]
+
+    if session['expires'] < time.time():
+        sessions.pop(session_id, None)
         return False
-    
+
     return True
 
 def generate_realistic_prefill(pan: str, ay: str) -> dict:
@@ -235,69 +381,101 @@ def generate_realistic_prefill(pan: str, ay: str) -> dict:
         }
     }
 
+# Only the PAN varies in the prefill payload (the assessment year is not
+# echoed back), so the full response is serialized once at import time and
+# a single C-level bytes replace substitutes the PAN per request — no dict
+# construction or JSON encoding on the hot path.
+_PREFILL_TEMPLATE_BYTES = orjson.dumps(generate_realistic_prefill("__PAN__", "__AY__"))
+
+
+def render_prefill(pan: str) -> bytes:
+    """Render the prefill response body for a PAN from the static template"""
+    return _PREFILL_TEMPLATE_BYTES.replace(b'"__PAN__"', orjson.dumps(pan))
+
+
+def _walk(data: Any, path: tuple) -> Any:
+    """Resolve a key path through nested dicts with chained .get lookups"""
+    for key in path:
+        if not isinstance(data, dict):
+            return None
+        data = data.get(key)
+    return data
+
+
+# Validation rules as (key path, predicate, code, message) rows. Adding a
+# rule is one tuple; the validator is a single pass over the table rather
+# than a growing ladder of nested branches.
+VALIDATION_RULES = (
+    (("personalInfo",), bool,
+     "ERR_ITR_001", "Personal information is mandatory"),
+    (("taxComputation", "totalIncome"), lambda v: v is None or v >= 0,
+     "ERR_ITR_078", "Total income cannot be negative"),
+)
+
+_ITR_3_4_RULES = (
+    (("businessIncome",), bool,
+     "ERR_ITR_045", "Business income details required for ITR-3/4"),
+)
+
+VALIDATION_RULES_BY_TYPE = {
+    "ITR-3": _ITR_3_4_RULES,
+    "ITR-4": _ITR_3_4_RULES,
+}
+
+
 def validate_itr_data(itr_type: str, itr_data: dict) -> tuple[bool, list]:
-    """Mock validation logic"""
-    errors = []
-    
-    # Basic validation rules
-    if not itr_data.get("personalInfo"):
-        errors.append({
-            "code": "ERR_ITR_001",
-            "message": "Personal information is mandatory"
-        })
-    
-    if itr_type in ["ITR-3", "ITR-4"]:
-        if not itr_data.get("businessIncome"):
-            errors.append({
-                "code": "ERR_ITR_045",
-                "message": "Business income details required for ITR-3/4"
-            })
-    
-    # Tax computation validation
-    if itr_data.get("taxComputation"):
-        total_income = itr_data["taxComputation"].get("totalIncome", 0)
-        if total_income < 0:
-            errors.append({
-                "code": "ERR_ITR_078",
-                "message": "Total income cannot be negative"
-            })
-    
-    return len(errors) == 0, errors
+    """Mock validation logic: one pass over the applicable rule tables"""
+    rules = VALIDATION_RULES + VALIDATION_RULES_BY_TYPE.get(itr_type, ())
+
+    errors = [
+        {"code": code, "message": message}
+        for path, predicate, code, message in rules
+        if not predicate(_walk(itr_data, path))
+    ]
+
+    return not errors, errors
 
 # ============================================================================
 # API ENDPOINTS
 # ============================================================================
 
+@app.exception_handler(ValueError)
+async def value_error_handler(request: Request, exc: ValueError):
+    """
+    Map bad input to a 400. Pydantic's ValidationError subclasses
+    ValueError, so malformed wrapped payloads land here too, while
+    HTTPExceptions (401 from session/signature checks, 404s) propagate
+    with their original status codes instead of being flattened to 400
+    by per-endpoint try/except blocks.
+    """
+    return ORJSONResponse(status_code=400, content={"detail": str(exc)})
+
+
 @app.post("/api/v1/auth/login", response_model=AuthResponse)
 async def login(request: RequestWrapper):
     """
     1. Authentication API (Login)
     Create a session for ERI Type-2 software
     """
-    try:
-        data = decode_wrapper(request)
-        auth_data = AuthRequest(**data)
-        
-        # Mock authentication
-        if auth_data.clientId != "ERI_TEST_CLIENT":
-            raise HTTPException(status_code=401, detail="Invalid credentials")
-        
-        session_id = secrets.token_urlsafe(32)
-        expires = datetime.now() + timedelta(days=1)
-        
-        sessions[session_id] = {
-            "clientId": auth_data.clientId,
-            "eriUserId": auth_data.eriUserId,
-            "expires": expires.isoformat()
-        }
-        
-        return AuthResponse(
-            status="SUCCESS",
-            sessionId=session_id,
-            expiresIn=86400
-        )
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
+    auth_data = _auth_adapter.validate_json(decode_wrapper(request))
+
+    # Mock authentication
+    if auth_data.clientId != "ERI_TEST_CLIENT":
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+
+    session_id = token_urlsafe_fast(32)
+
+    sessions[session_id] = {
+        "clientId": auth_data.clientId,
+        "eriUserId": auth_data.eriUserId,
+        "expires": time.time() + SESSION_TTL_SECONDS
+    }
+
+    return AuthResponse(
+        status="SUCCESS",
+        sessionId=session_id,
+        expiresIn=SESSION_TTL_SECONDS
+    )
 
 @app.post("/api/v1/client/add", response_model=AddClientResponse)
 async def add_client(
@@ -310,28 +488,24 @@ async def add_client(
     """
     if not verify_session(authorization):
         raise HTTPException(status_code=401, detail="Invalid or expired session")
-    
-    try:
-        data = decode_wrapper(request)
-        client_data = AddClientRequest(**data)
-        
-        # Validate PAN format
-        if len(client_data.pan) != 10:
-            raise HTTPException(status_code=400, detail="Invalid PAN format")
-        
-        client_ref_id = f"CLT_{secrets.token_hex(8)}"
-        clients[client_data.pan] = {
-            "referenceId": client_ref_id,
-            "assessmentYear": client_data.assessmentYear,
-            "addedAt": datetime.now().isoformat()
-        }
-        
-        return AddClientResponse(
-            status="SUCCESS",
-            clientReferenceId=client_ref_id
-        )
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
+
+    client_data = _add_client_adapter.validate_json(decode_wrapper(request))
+
+    # Validate PAN format
+    if len(client_data.pan) != 10:
+        raise HTTPException(status_code=400, detail="Invalid PAN format")
+
+    client_ref_id = f"CLT_{token_hex_fast(8)}"
+    clients[client_data.pan] = {
+        "referenceId": client_ref_id,
+        "assessmentYear": client_data.assessmentYear,
+        "addedAt": datetime.now().isoformat()
+    }
+
+    return AddClientResponse(
+        status="SUCCESS",
+        clientReferenceId=client_ref_id
+    )
 
 @app.post("/api/v1/prefill/get")
 async def get_prefill(
@@ -344,20 +518,22 @@ async def get_prefill(
     """
     if not verify_session(authorization):
         raise HTTPException(status_code=401, detail="Invalid or expired session")
-    
-    try:
-        data = decode_wrapper(request)
-        prefill_req = PrefillRequest(**data)
-        
-        # Check if client is added
-        if prefill_req.pan not in clients:
-            raise HTTPException(status_code=400, detail="Client not added. Call add_client first")
-        
-        prefill_data = generate_realistic_prefill(prefill_req.pan, prefill_req.assessmentYear)
-        
-        return JSONResponse(content=prefill_data)
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
+
+    prefill_req = _prefill_adapter.validate_json(decode_wrapper(request))
+
+    # Check if client is added
+    if prefill_req.pan not in clients:
+        raise HTTPException(status_code=400, detail="Client not added. Call add_client first")
+
+    cache_key = (prefill_req.pan, prefill_req.assessmentYear)
+    cached = _prefill_cache.get(cache_key)
+    if cached and cached[0] > time.time():
+        return Response(content=cached[1], media_type="application/json")
+
+    body = render_prefill(prefill_req.pan)
+    _prefill_cache[cache_key] = (time.time() + PREFILL_CACHE_TTL_SECONDS, body)
+
+    return Response(content=body, media_type="application/json")
 
 @app.post("/api/v1/itr/validate", response_model=ValidationResponse)
 async def validate_itr(
@@ -371,33 +547,41 @@ async def validate_itr(
     if not verify_session(authorization):
         raise HTTPException(status_code=401, detail="Invalid or expired session")
     
-    try:
-        data = decode_wrapper(request)
-        validation_req = ValidationRequest(**data)
-        
-        is_valid, errors = validate_itr_data(validation_req.itrType, validation_req.itrData)
-        
-        if is_valid:
-            validation_id = f"VAL_{secrets.token_hex(16)}"
-            validations[validation_id] = {
-                "pan": validation_req.pan,
-                "assessmentYear": validation_req.assessmentYear,
-                "itrType": validation_req.itrType,
-                "itrData": validation_req.itrData,
-                "validatedAt": datetime.now().isoformat()
-            }
-            
-            return ValidationResponse(
-                isValid=True,
-                validationId=validation_id
-            )
-        else:
-            return ValidationResponse(
-                isValid=False,
-                errors=[ValidationError(**err) for err in errors]
-            )
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
+    validation_req = _validation_adapter.validate_json(decode_wrapper(request))
+
+    # Identical payloads validate to the same outcome; key on a digest
+    # of the canonical JSON so the rule pass runs once per distinct ITR
+    cache_key = (
+        validation_req.itrType,
+        hashlib.sha256(orjson.dumps(validation_req.itrData, option=orjson.OPT_SORT_KEYS)).digest()
+    )
+    result = _validation_cache.get(cache_key)
+    if result is None:
+        result = validate_itr_data(validation_req.itrType, validation_req.itrData)
+        while len(_validation_cache) >= VALIDATION_CACHE_MAX_ENTRIES:
+            _validation_cache.pop(next(iter(_validation_cache)))
+        _validation_cache[cache_key] = result
+    is_valid, errors = result
+
+    if is_valid:
+        validation_id = f"VAL_{token_hex_fast(16)}"
+        validations[validation_id] = {
+            "pan": validation_req.pan,
+            "assessmentYear": validation_req.assessmentYear,
+            "itrType": validation_req.itrType,
+            "itrData": validation_req.itrData,
+            "validatedAt": datetime.now().isoformat()
+        }
+
+        return ValidationResponse(
+            isValid=True,
+            validationId=validation_id
+        )
+    else:
+        return ValidationResponse(
+            isValid=False,
+            errors=[ValidationError(**err) for err in errors]
+        )
 
 @app.post("/api/v1/itr/save-draft", response_model=SaveDraftResponse)
 async def save_draft(
@@ -411,26 +595,22 @@ async def save_draft(
     if not verify_session(authorization):
         raise HTTPException(status_code=401, detail="Invalid or expired session")
     
-    try:
-        data = decode_wrapper(request)
-        save_req = SaveDraftRequest(**data)
-        
-        if save_req.validationId not in validations:
-            raise HTTPException(status_code=400, detail="Invalid validation ID")
-        
-        draft_id = f"DRF_{secrets.token_hex(16)}"
-        drafts[draft_id] = {
-            "validationId": save_req.validationId,
-            "validationData": validations[save_req.validationId],
-            "savedAt": datetime.now().isoformat()
-        }
-        
-        return SaveDraftResponse(
-            status="SAVED",
-            draftId=draft_id
-        )
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
+    save_req = _save_draft_adapter.validate_json(decode_wrapper(request))
+
+    if save_req.validationId not in validations:
+        raise HTTPException(status_code=400, detail="Invalid validation ID")
+
+    draft_id = f"DRF_{token_hex_fast(16)}"
+    drafts[draft_id] = {
+        "validationId": save_req.validationId,
+        "validationData": validations[save_req.validationId],
+        "savedAt": datetime.now().isoformat()
+    }
+
+    return SaveDraftResponse(
+        status="SAVED",
+        draftId=draft_id
+    )
 
 @app.post("/api/v1/verification/set-mode", response_model=VerificationModeResponse)
 async def set_verification_mode(
@@ -444,26 +624,23 @@ async def set_verification_mode(
     if not verify_session(authorization):
         raise HTTPException(status_code=401, detail="Invalid or expired session")
     
-    try:
-        data = decode_wrapper(request)
-        verify_req = VerificationModeRequest(**data)
-        
-        if verify_req.draftId not in drafts:
-            raise HTTPException(status_code=400, detail="Invalid draft ID")
-        
-        # Update draft with verification mode
-        drafts[verify_req.draftId]["verificationMode"] = verify_req.verificationMode
-        
-        return VerificationModeResponse(
-            status="VERIFICATION_MODE_SET"
-        )
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
+    verify_req = _verification_adapter.validate_json(decode_wrapper(request))
+
+    if verify_req.draftId not in drafts:
+        raise HTTPException(status_code=400, detail="Invalid draft ID")
+
+    # Update draft with verification mode
+    drafts[verify_req.draftId]["verificationMode"] = verify_req.verificationMode
+
+    return VerificationModeResponse(
+        status="VERIFICATION_MODE_SET"
+    )
 
 @app.post("/api/v1/itr/submit", response_model=SubmitITRResponse)
 async def submit_itr(
     request: RequestWrapper,
-    authorization: Optional[str] = Header(None)
+    authorization: Optional[str] = Header(None),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
 ):
     """
     7. Submit ITR API
@@ -471,37 +648,45 @@ async def submit_itr(
     """
     if not verify_session(authorization):
         raise HTTPException(status_code=401, detail="Invalid or expired session")
-    
-    try:
-        data = decode_wrapper(request)
-        submit_req = SubmitITRRequest(**data)
-        
-        if submit_req.draftId not in drafts:
-            raise HTTPException(status_code=400, detail="Invalid draft ID")
-        
-        draft = drafts[submit_req.draftId]
-        
-        if "verificationMode" not in draft:
-            raise HTTPException(status_code=400, detail="Verification mode not set")
-        
-        # Generate acknowledgement number (14 digits)
-        ack_number = f"{datetime.now().year}{secrets.randbelow(10**10):010d}"
-        submission_date = datetime.now().isoformat()
-        
-        submissions[ack_number] = {
-            "draftId": submit_req.draftId,
-            "draft": draft,
-            "submittedAt": submission_date,
-            "status": "SUBMITTED"
-        }
-        
-        return SubmitITRResponse(
-            status="SUBMITTED",
-            acknowledgementNumber=ack_number,
-            submissionDate=submission_date
-        )
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
+
+    # A retried submission replays the original acknowledgement instead
+    # of creating a new submission entry
+    if idempotency_key:
+        cached = _idempotency_cache.get(idempotency_key)
+        if cached and cached[0] > time.time():
+            return cached[1]
+
+    submit_req = _submit_adapter.validate_json(decode_wrapper(request))
+
+    if submit_req.draftId not in drafts:
+        raise HTTPException(status_code=400, detail="Invalid draft ID")
+
+    draft = drafts[submit_req.draftId]
+
+    if "verificationMode" not in draft:
+        raise HTTPException(status_code=400, detail="Verification mode not set")
+
+    # Generate acknowledgement number (14 digits)
+    ack_number = f"{datetime.now().year}{int.from_bytes(_token_pool.take(5), 'big') % 10**10:010d}"
+    submission_date = datetime.now().isoformat()
+
+    submissions[ack_number] = {
+        "draftId": submit_req.draftId,
+        "draft": draft,
+        "submittedAt": submission_date,
+        "status": "SUBMITTED"
+    }
+
+    response = SubmitITRResponse(
+        status="SUBMITTED",
+        acknowledgementNumber=ack_number,
+        submissionDate=submission_date
+    )
+
+    if idempotency_key:
+        _idempotency_cache[idempotency_key] = (time.time() + IDEMPOTENCY_TTL_SECONDS, response)
+
+    return response
 
 @app.post("/api/v1/acknowledgement/get", response_model=AcknowledgementResponse)
 async def get_acknowledgement(
@@ -515,20 +700,16 @@ async def get_acknowledgement(
     if not verify_session(authorization):
         raise HTTPException(status_code=401, detail="Invalid or expired session")
     
-    try:
-        data = decode_wrapper(request)
-        ack_req = AcknowledgementRequest(**data)
-        
-        if ack_req.acknowledgementNumber not in submissions:
-            raise HTTPException(status_code=404, detail="Acknowledgement not found")
-        
-        return AcknowledgementResponse(
-            status="SUCCESS",
-            pdfUrl=f"https://eportal.incometax.gov.in/iec/foservices/{ack_req.acknowledgementNumber}/download",
-            itrVAvailable=True
-        )
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
+    ack_req = _ack_adapter.validate_json(decode_wrapper(request))
+
+    if ack_req.acknowledgementNumber not in submissions:
+        raise HTTPException(status_code=404, detail="Acknowledgement not found")
+
+    return AcknowledgementResponse(
+        status="SUCCESS",
+        pdfUrl=f"https://eportal.incometax.gov.in/iec/foservices/{ack_req.acknowledgementNumber}/download",
+        itrVAvailable=True
+    )
 
 @app.post("/api/v1/auth/logout")
 async def logout(authorization: Optional[str] = Header(None)):
@@ -581,4 +762,8 @@ async def health_check():
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8002)
\ No newline at end of file
+    # uvloop/httptools ship with uvicorn[standard]; pin them explicitly
+    # rather than trusting auto-detection. State (sessions, drafts, the
+    # response caches) lives in-process, so this stays a single worker —
+    # scaling out requires moving those stores to a shared backend first.
+    uvicorn.run("itr:app", host="0.0.0.0", port=8002, loop="uvloop", http="httptools")
\ No newline at end of file
@@ -3,25 +3,123 @@
 # ============================================================
 
 # llm/openai_client.py
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+
+import httpx
 import openai
+import orjson
 from utils.config import settings
 from typing import AsyncGenerator, List, Dict, Optional
 
 class OpenAIClient:
     """Wrapper for OpenAI API"""
-    
+
+    # Response cache for opt-in deterministic prompts (classification,
+    # prefill parsing): bounded LRU with a day of TTL
+    CACHE_MAX_ENTRIES = 512
+    CACHE_TTL_SECONDS = 86400
+
     def __init__(self):
-        self.client = openai.AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+        # Shared pooled transport so concurrent completions reuse
+        # TCP/TLS connections instead of handshaking per request
+        self._http_client = httpx.AsyncClient(
+            # Multiplex concurrent completions over one connection
+            # instead of one socket per in-flight request
+            http2=True,
+            limits=httpx.Limits(
+                max_keepalive_connections=50,
+                max_connections=200,
+                # Don't hold idle sockets past the server's keepalive
+                # window; stale ones fail on first reuse
+                keepalive_expiry=60
+            )
+        )
+        self.client = openai.AsyncOpenAI(
+            api_key=settings.OPENAI_API_KEY,
+            http_client=self._http_client
+        )
         self.model = "gpt-4o"
-    
-    async def generate(self, prompt: str, max_tokens: int = 4000) -> str:
-        """Generate response from OpenAI"""
-        response = await self.client.chat.completions.create(
+        # Created lazily in _limiter so it binds to the running loop
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._response_cache: "OrderedDict[str, tuple]" = OrderedDict()
+
+    async def aclose(self):
+        """Drain the connection pool on shutdown"""
+        await self.client.close()
+
+    def _limiter(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(settings.OPENAI_MAX_CONCURRENCY)
+        return self._semaphore
+
+    async def _create_with_retry(self, **kwargs):
+        """Completion call gated by the concurrency limiter, with
+        exponential backoff on rate limits and transient connection errors"""
+        delay = 1.0
+        for attempt in range(4):
+            try:
+                async with self._limiter():
+                    return await self.client.chat.completions.create(**kwargs)
+            except (openai.RateLimitError, openai.APIConnectionError):
+                if attempt == 3:
+                    raise
+                await asyncio.sleep(delay)
+                delay *= 2
+
+    def _cache_key(self, prompt: str, max_tokens: int) -> str:
+        return hashlib.blake2b(
+            (self.model + prompt + str(max_tokens)).encode(), digest_size=16
+        ).hexdigest()
+
+    def _cache_get(self, key: str) -> Optional[str]:
+        entry = self._response_cache.get(key)
+        if entry is None:
+            return None
+        expires, content = entry
+        if expires < time.monotonic():
+            del self._response_cache[key]
+            return None
+        self._response_cache.move_to_end(key)
+        return content
+
+    def _cache_put(self, key: str, content: str):
+        self._response_cache[key] = (time.monotonic() + self.CACHE_TTL_SECONDS, content)
+        self._response_cache.move_to_end(key)
+        while len(self._response_cache) > self.CACHE_MAX_ENTRIES:
+            self._response_cache.popitem(last=False)
+
+    async def generate(self, prompt: str, max_tokens: int = 4000, cache: bool = False) -> str:
+        """Generate response from OpenAI.
+
+        cache=True skips the round-trip for repeated identical prompts;
+        only use it for deterministic work (extraction, classification),
+        never for conversational output.
+        """
+        if cache:
+            key = self._cache_key(prompt, max_tokens)
+            cached = self._cache_get(key)
+            if cached is not None:
+                return cached
+
+        response = await self._create_with_retry(
             model=self.model,
             max_tokens=max_tokens,
             messages=[{"role": "user", "content": prompt}]
         )
-        return response.choices[0].message.content
+        content = response.choices[0].message.content
+        if cache:
+            self._cache_put(key, content)
+        return content
+
+    async def generate_batch(self, prompts: List[str], max_tokens: int = 4000) -> List[str]:
+        """Run prompts concurrently; the shared limiter caps the fan-out
+        so a large batch can't starve interactive requests"""
+        return list(await asyncio.gather(
+            *(self.generate(prompt, max_tokens) for prompt in prompts)
+        ))
     
     async def generate_with_history(
         self,
@@ -42,8 +140,8 @@ class OpenAIClient:
         
         # Add current message
         messages.append({"role": "user", "content": message})
-        
-        response = await self.client.chat.completions.create(
+
+        response = await self._create_with_retry(
             model=self.model,
             max_tokens=max_tokens,
             messages=messages
@@ -71,3 +169,86 @@ class OpenAIClient:
             if chunk.choices[0].delta.content:
                 yield chunk.choices[0].delta.content
 
+    async def embed(self, texts: List[str], model: str = "text-embedding-3-small") -> List[List[float]]:
+        """Embed a batch of texts in one request"""
+        response = await self.client.embeddings.create(model=model, input=texts)
+        return [item.embedding for item in response.data]
+
+    async def generate_many(
+        self,
+        system_prompt: str,
+        items: List[str],
+        max_tokens: int = 4000
+    ) -> List[Optional[str]]:
+        """Answer many small independent items in a single completion.
+        One request amortizes the system prompt and per-call overhead
+        across all items instead of paying it N times."""
+        numbered = "\n".join(f"{i}. {item}" for i, item in enumerate(items))
+        response = await self._create_with_retry(
+            model=self.model,
+            max_tokens=max_tokens,
+            response_format={"type": "json_object"},
+            messages=[
+                {"role": "system", "content": (
+                    f"{system_prompt}\n\n"
+                    "Answer every numbered item independently. Respond with a "
+                    "JSON object mapping each item number (as a string) to its "
+                    "answer, e.g. {\"0\": \"...\", \"1\": \"...\"}."
+                )},
+                {"role": "user", "content": numbered}
+            ]
+        )
+        answers = orjson.loads(response.choices[0].message.content)
+        return [answers.get(str(i)) for i in range(len(items))]
+
+    async def batch_generate(
+        self,
+        prompts: List[str],
+        max_tokens: int = 4000,
+        poll_interval: float = 30.0
+    ) -> List[Optional[str]]:
+        """Run many prompts through the Batch API at 50% of the
+        synchronous price. Latency is minutes, not seconds - only use
+        this for offline work (summaries, backfills), never chat."""
+        lines = [
+            orjson.dumps({
+                "custom_id": str(i),
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {
+                    "model": self.model,
+                    "max_tokens": max_tokens,
+                    "messages": [{"role": "user", "content": prompt}]
+                }
+            })
+            for i, prompt in enumerate(prompts)
+        ]
+        batch_file = await self.client.files.create(
+            file=("batch.jsonl", b"\n".join(lines)),
+            purpose="batch"
+        )
+        batch = await self.client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h"
+        )
+
+        while batch.status not in ("completed", "failed", "expired", "cancelled"):
+            await asyncio.sleep(poll_interval)
+            batch = await self.client.batches.retrieve(batch.id)
+
+        if batch.status != "completed" or not batch.output_file_id:
+            raise RuntimeError(f"Batch {batch.id} finished with status {batch.status}")
+
+        output = await self.client.files.content(batch.output_file_id)
+        results: List[Optional[str]] = [None] * len(prompts)
+        for line in output.content.splitlines():
+            if not line:
+                continue
+            entry = orjson.loads(line)
+            response = entry.get("response")
+            if response and response.get("status_code") == 200:
+                body = response["body"]
+                results[int(entry["custom_id"])] = body["choices"][0]["message"]["content"]
+        return results
+
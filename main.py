@@ -6,42 +6,68 @@
 import logging
 from pathlib import Path
 
-from fastapi import FastAPI, HTTPException, UploadFile, File, Depends, BackgroundTasks
+from fastapi import FastAPI, HTTPException, UploadFile, File, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import ORJSONResponse, Response
 from contextlib import asynccontextmanager
 
 from datetime import datetime
 from typing import List, Dict, Optional
+import asyncio
+import hashlib
 import uuid
-import shutil
 import os
+import sys
+
+import aiofiles
 from sqlalchemy.orm import Session
-import json
+import orjson
+from sse_starlette.sse import EventSourceResponse
 
 from database.models import User, UserStatus
-from database.connection import get_db_session, init_db
+from database.connection import engine, get_db_session, init_db
+from database.queries import GET_USER_BY_ID
 from utils import models
 from llm.openai_client import OpenAIClient
-from agents.chat_agent_with_memory import ChatAgentWithMemory
-from agents.itr_filing_agent import ITRFilingCrew
+from agents.chat_agent_with_memory import ChatAgentWithMemory, CREW_POOL
+from agents.itr_filing_agent import run_filing_in_worker
 from services.memory_service import MemoryService
 from services.itr_service import ITRService
 from services.capital_gains_service import CapitalGainsService
 from services.document_service import DocumentService
-from fastapi.responses import FileResponse
 
 
 
 
+# Built in lifespan, not at import: constructing the CrewAI agents is
+# slow and reads config, and doing it at module scope penalizes every
+# tool that merely imports this module
+llm_client: Optional[OpenAIClient] = None
+chat_agent_memory: Optional[ChatAgentWithMemory] = None
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    global llm_client, chat_agent_memory
     init_db()
+    llm_client = OpenAIClient()
+    chat_agent_memory = ChatAgentWithMemory(llm_client)
+    app.state.llm_client = llm_client
+    app.state.chat_agent_memory = chat_agent_memory
     yield
+    # Drain in-flight background work before tearing the client down
+    await chat_agent_memory.aclose()
+    await llm_client.aclose()
 
 
 
-app = FastAPI(title="TaxAI Backend with Memory & ITR Filing", lifespan=lifespan)
+# orjson serializes response payloads (incl. datetimes) in C, so
+# handlers can return naked datetime columns without .isoformat()
+app = FastAPI(
+    title="TaxAI Backend with Memory & ITR Filing",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
+)
 
 # Add CORS Middleware
 app.add_middleware(
@@ -53,17 +79,48 @@ app.add_middleware(
 )
 
 
-#--------------------------------------------------
-# Initialize components
-#-----------------------------------------------------
-llm_client = OpenAIClient()
-chat_agent_memory = ChatAgentWithMemory(llm_client)
-itr_crew = ITRFilingCrew()
-
 # Ensure uploads directory exists
 UPLOAD_DIR = "uploads"
+UPLOAD_CHUNK_SIZE = 1 << 20  # 1MB
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
+# The landing page is static: serve cached bytes with an ETag instead of
+# re-stat'ing and re-opening index.html on every hit
+INDEX_BYTES = Path("index.html").read_bytes()
+INDEX_ETAG = hashlib.md5(INDEX_BYTES).hexdigest()
+
+# Zero-copy persistence is only possible when the upload is backed by a
+# real file descriptor (Starlette spools uploads over 1MB to disk)
+_SENDFILE_AVAILABLE = hasattr(os, "sendfile") and sys.platform == "linux"
+
+
+def _persist_upload_sendfile(src, dst_path: str) -> int:
+    """
+    Copy a disk-backed upload to dst_path with os.sendfile, moving bytes
+    between kernel buffers without round-tripping through Python. Returns
+    the number of bytes written. Runs in a worker thread.
+    """
+    src.seek(0)
+    dst_fd = os.open(dst_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        offset = 0
+        while True:
+            sent = os.sendfile(dst_fd, src.fileno(), offset, UPLOAD_CHUNK_SIZE)
+            if sent == 0:
+                return offset
+            offset += sent
+    finally:
+        os.close(dst_fd)
+
+
+def _hash_file(path: str) -> str:
+    """Digest a file on disk in chunks. Runs in a worker thread."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(UPLOAD_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
 
 
 
@@ -98,14 +155,14 @@ logging.getLogger("httpx").setLevel(logging.WARNING)
 #--------------------------------------------------------------------------------------------------
 
 @app.post("/api/register")
-async def register_user(
+def register_user(
     request: models.RagisterRequest,
     db: Session = Depends(get_db_session)
 ):
     """Register a new user in PostgreSQL"""
     try:
         # Check if user exists
-        existing_user = db.query(User).filter(User.user_id == request.user_id).first()
+        existing_user = db.execute(GET_USER_BY_ID, {"uid": request.user_id}).scalar_one_or_none()
         if existing_user:
             return {"message": "User already registered", "user_id": request.user_id}
             
@@ -129,23 +186,32 @@ async def register_user(
 
 
 @app.get("/api/get_users")
-async def get_users(db: Session = Depends(get_db_session)):
+def get_users(limit: int = 100, offset: int = 0, db: Session = Depends(get_db_session)):
     """Get all users"""
-    users = db.query(User).all()
+    # Project only the four returned columns - loading full User rows
+    # also fires the selectin loads for documents and filings per user
+    limit = min(limit, 500)
+    users = (
+        db.query(User.user_id, User.user_name, User.status, User.created_at)
+        .order_by(User.created_at)
+        .limit(limit)
+        .offset(offset)
+        .all()
+    )
     return [
         {
             "user_id": u.user_id,
             "user_name": u.user_name,
             "status": u.status.value,
-            "created_at": u.created_at.isoformat() if u.created_at else None
+            "created_at": u.created_at
         }
         for u in users
     ]
 
 @app.get("/api/get_user")
-async def get_user(user_id: str, db: Session = Depends(get_db_session)):
+def get_user(user_id: str, db: Session = Depends(get_db_session)):
     """Get specific user"""
-    user = db.query(User).filter(User.user_id == user_id).first()
+    user = db.execute(GET_USER_BY_ID, {"uid": user_id}).scalar_one_or_none()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -159,9 +225,9 @@ async def get_user(user_id: str, db: Session = Depends(get_db_session)):
     }
 
 @app.delete("/api/delete_user")
-async def delete_user(user_id: str, db: Session = Depends(get_db_session)):
+def delete_user(user_id: str, db: Session = Depends(get_db_session)):
     """Delete user and all associated data"""
-    user = db.query(User).filter(User.user_id == user_id).first()
+    user = db.execute(GET_USER_BY_ID, {"uid": user_id}).scalar_one_or_none()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -179,24 +245,49 @@ async def upload_file(
 ):
     """Handle file uploads and store metadata in PostgreSQL"""
     try:
-        # Save file to disk
+        # Save file to disk in chunks without blocking the event loop,
+        # summing chunk lengths so no getsize stat is needed afterwards.
+        # Large uploads that Starlette has already spooled to disk go
+        # through sendfile instead: a kernel-space copy with no Python
+        # buffer churn.
         file_path = os.path.join(UPLOAD_DIR, file.filename)
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
-        # Get file size
-        file_size = os.path.getsize(file_path)
-        
-        # Store metadata in DB
+        if _SENDFILE_AVAILABLE and getattr(file.file, "_rolled", False):
+            file_size = await asyncio.to_thread(_persist_upload_sendfile, file.file, file_path)
+            sha256 = await asyncio.to_thread(_hash_file, file_path)
+        else:
+            file_size = 0
+            digest = hashlib.sha256()
+            async with aiofiles.open(file_path, "wb") as buffer:
+                while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                    file_size += len(chunk)
+                    digest.update(chunk)
+                    await buffer.write(chunk)
+            sha256 = digest.hexdigest()
+
+        # Same bytes already on record for this user: keep the existing
+        # row instead of storing (and later OCR-ing) a second copy
         doc_service = DocumentService(db)
+        existing = doc_service.find_by_hash(user_id, sha256)
+        if existing:
+            if existing.file_path != file_path:
+                os.remove(file_path)
+            return {
+                "filename": existing.file_name,
+                "document_id": existing.id,
+                "status": "duplicate",
+                "message": "Identical file already uploaded"
+            }
+
+        # Store metadata in DB
         doc = doc_service.add_document(
             user_id=user_id,
             file_name=file.filename,
             file_path=file_path,
             document_type=document_type,
-            file_size=file_size
+            file_size=file_size,
+            sha256=sha256
         )
-        
+
         return {
             "filename": file.filename,
             "document_id": doc.id,
@@ -208,10 +299,17 @@ async def upload_file(
 
 
 @app.get("/api/documents/{user_id}")
-async def get_user_documents(user_id: str, db: Session = Depends(get_db_session)):
-    """Get all documents for a user"""
+def get_user_documents(
+    user_id: str,
+    limit: int = 50,
+    after_uploaded_at: Optional[datetime] = None,
+    db: Session = Depends(get_db_session)
+):
+    """Get a page of documents for a user (keyset-paginated)"""
     doc_service = DocumentService(db)
-    docs = doc_service.get_user_documents(user_id)
+    docs = doc_service.get_user_documents(
+        user_id, limit=min(limit, 200), after_uploaded_at=after_uploaded_at
+    )
     
     return [
         {
@@ -219,14 +317,14 @@ async def get_user_documents(user_id: str, db: Session = Depends(get_db_session)
             "file_name": d.file_name,
             "document_type": d.document_type,
             "file_size": d.file_size,
-            "uploaded_at": d.uploaded_at.isoformat()
+            "uploaded_at": d.uploaded_at
         }
         for d in docs
     ]
 
 
 @app.delete("/api/document/{document_id}")
-async def delete_document(document_id: int, db: Session = Depends(get_db_session)):
+def delete_document(document_id: int, db: Session = Depends(get_db_session)):
     """Delete a document"""
     doc_service = DocumentService(db)
     
@@ -247,55 +345,65 @@ async def delete_document(document_id: int, db: Session = Depends(get_db_session
     
     return {"message": "Document deleted successfully"}
 
+# Keyword triggers for the upload widget; scanned against lowercased
+# text once per message/response instead of per keyword
+_UPLOAD_KEYWORDS = ("upload", "attach")
+_ASK_KEYWORDS = ("upload", "provide", "send")
+_DOC_KEYWORDS = ("invoice", "document")
+
 @app.post("/api/chat/stream")
 async def chat_stream(request: models.ChatRequest):
     """Streaming chat endpoint with Memory (Short-term + Long-term)"""
-    
+
     async def generate_stream():
         logger.info(f"Starting stream for user :{request.user_id}\n Session: {request.conversation_id}")
         try:
             # Generate IDs
             user_id = request.user_id or "default_user"  # Should come from auth
             conversation_id = request.conversation_id or f"conv_{datetime.now().timestamp()}"
-            
+
             # 1. Send Status: Thinking
-            yield f"data: {json.dumps({'status': 'Thinking...'})}\n\n"
-            
+            yield orjson.dumps({'status': 'Thinking...'}).decode()
+
             # Check for upload intent immediately
-            if "upload" in request.message.lower() or "attach" in request.message.lower():
+            message_lc = request.message.lower()
+            user_wants_upload = any(kw in message_lc for kw in _UPLOAD_KEYWORDS)
+            if user_wants_upload:
                  print("User wants upload - triggering widget immediately")
-                 yield f"data: {json.dumps({'request_upload': True, 'upload_type': 'document'})}\n\n"
-            
+                 yield orjson.dumps({'request_upload': True, 'upload_type': 'document'}).decode()
+
             # 2. Stream response using memory-aware agent
             response_chunks = []
-            
+
             async for chunk in chat_agent_memory.chat_stream(
                 user_id=user_id,
                 session_id=conversation_id,
                 message=request.message
             ):
                 response_chunks.append(chunk)
-                yield f"data: {json.dumps({'chunk': chunk})}\n\n"
-            
+                yield orjson.dumps({'chunk': chunk}).decode()
+
             full_response = "".join(response_chunks)
-            
+
             # 3. Check for Intent & Documents
-            user_wants_upload = "upload" in request.message.lower() or "attach" in request.message.lower()
-            ai_asks_upload = "upload" in full_response.lower() or "provide" in full_response.lower() or "send" in full_response.lower()
-            
-            if user_wants_upload or (ai_asks_upload and ("invoice" in full_response.lower() or "document" in full_response.lower())):
+            response_lc = full_response.lower()
+            ai_asks_upload = any(kw in response_lc for kw in _ASK_KEYWORDS)
+
+            if user_wants_upload or (ai_asks_upload and any(kw in response_lc for kw in _DOC_KEYWORDS)):
                 print("Triggering upload widget")
-                yield f"data: {json.dumps({'request_upload': True, 'upload_type': 'document'})}\n\n"
+                yield orjson.dumps({'request_upload': True, 'upload_type': 'document'}).decode()
 
-            yield f"data: {json.dumps({'done': True, 'conversation_id': conversation_id})}\n\n"
+            yield orjson.dumps({'done': True, 'conversation_id': conversation_id}).decode()
             
         except Exception as e:
             print(f"Error: {e}")
             import traceback
             traceback.print_exc()
-            yield f"data: {json.dumps({'error': str(e)})}\n\n"
+            yield orjson.dumps({'error': str(e)}).decode()
     
-    return StreamingResponse(generate_stream(), media_type="text/event-stream")
+    # EventSourceResponse owns the framing and sends a comment ping
+    # every 15s so proxies don't reap quiet streams
+    return EventSourceResponse(generate_stream(), ping=15)
 
 
 #--------------------------------------------------------------------------------------------------
@@ -303,11 +411,11 @@ async def chat_stream(request: models.ChatRequest):
 #--------------------------------------------------------------------------------------------------
 
 @app.get("/api/memory/sessions/{user_id}")
-async def get_user_sessions(user_id: str, db: Session = Depends(get_db_session)):
+def get_user_sessions(user_id: str, db: Session = Depends(get_db_session)):
     """Get all conversation sessions for a user"""
     memory_service = MemoryService(db)
-    sessions = memory_service.get_user_sessions(user_id)
-    
+    sessions = memory_service.get_user_sessions_with_counts(user_id)
+
     return {
         "user_id": user_id,
         "sessions": [
@@ -315,16 +423,16 @@ async def get_user_sessions(user_id: str, db: Session = Depends(get_db_session))
                 "session_id": s.session_id,
                 "title": s.title,
                 "is_active": s.is_active,
-                "started_at": s.started_at.isoformat() if s.started_at else None,
-                "last_activity": s.last_activity.isoformat() if s.last_activity else None,
-                "message_count": len(s.messages)
+                "started_at": s.started_at,
+                "last_activity": s.last_activity,
+                "message_count": message_count
             }
-            for s in sessions
+            for s, message_count in sessions
         ]
     }
 
 @app.get("/api/memory/conversation/{session_id}")
-async def get_conversation_history(session_id: str, db: Session = Depends(get_db_session)):
+def get_conversation_history(session_id: str, db: Session = Depends(get_db_session)):
     """Get conversation history for a session"""
     memory_service = MemoryService(db)
     messages = memory_service.get_recent_messages(session_id, limit=100)
@@ -335,7 +443,7 @@ async def get_conversation_history(session_id: str, db: Session = Depends(get_db
             {
                 "role": msg.role.value,
                 "content": msg.content,
-                "created_at": msg.created_at.isoformat() if msg.created_at else None,
+                "created_at": msg.created_at,
                 "intent": msg.intent,
                 "entities": msg.entities
             }
@@ -344,7 +452,7 @@ async def get_conversation_history(session_id: str, db: Session = Depends(get_db
     }
 
 @app.get("/api/memory/user/{user_id}")
-async def get_user_memory(user_id: str, db: Session = Depends(get_db_session)):
+def get_user_memory(user_id: str, db: Session = Depends(get_db_session)):
     """Get user's long-term memory"""
     memory_service = MemoryService(db)
     memory = memory_service.get_user_memory(user_id)
@@ -364,11 +472,11 @@ async def get_user_memory(user_id: str, db: Session = Depends(get_db_session)):
             "has_capital_gains": memory.has_capital_gains,
             "has_house_property": memory.has_house_property
         },
-        "last_updated": memory.updated_at.isoformat() if memory.updated_at else None
+        "last_updated": memory.updated_at
     }
 
 @app.post("/api/memory/update/{user_id}")
-async def update_user_memory(user_id: str, updates: dict, db: Session = Depends(get_db_session)):
+def update_user_memory(user_id: str, updates: dict, db: Session = Depends(get_db_session)):
     """Update user's long-term memory"""
     memory_service = MemoryService(db)
     memory_service.update_user_memory(user_id, updates)
@@ -376,7 +484,7 @@ async def update_user_memory(user_id: str, updates: dict, db: Session = Depends(
     return {"message": "Memory updated successfully"}
 
 @app.delete("/api/memory/session/{session_id}")
-async def delete_session(session_id: str, db: Session = Depends(get_db_session)):
+def delete_session(session_id: str, db: Session = Depends(get_db_session)):
     """Delete a conversation session"""
     memory_service = MemoryService(db)
     memory_service.delete_session(session_id)
@@ -384,7 +492,7 @@ async def delete_session(session_id: str, db: Session = Depends(get_db_session))
     return {"message": "Session deleted successfully"}
 
 @app.post("/api/memory/session/{session_id}/end")
-async def end_session(session_id: str, db: Session = Depends(get_db_session)):
+def end_session(session_id: str, db: Session = Depends(get_db_session)):
     """End a conversation session"""
     memory_service = MemoryService(db)
     memory_service.end_session(session_id)
@@ -392,7 +500,7 @@ async def end_session(session_id: str, db: Session = Depends(get_db_session)):
     return {"message": "Session ended successfully"}
 
 @app.post("/api/memory/session/new")
-async def create_new_session(
+def create_new_session(
     user_id: str,
     session_id: Optional[str] = None,
     db: Session = Depends(get_db_session)
@@ -407,12 +515,12 @@ async def create_new_session(
     return {
         "session_id": session.session_id,
         "user_id": session.user_id,
-        "started_at": session.started_at.isoformat() if session.started_at else None,
+        "started_at": session.started_at,
         "is_active": session.is_active
     }
 
 @app.get("/api/memory/demographics/{user_id}")
-async def get_user_demographics(user_id: str, db: Session = Depends(get_db_session)):
+def get_user_demographics(user_id: str, db: Session = Depends(get_db_session)):
     """Get user's demographic information"""
     memory_service = MemoryService(db)
     demographics = memory_service.get_demographics(user_id)
@@ -423,7 +531,7 @@ async def get_user_demographics(user_id: str, db: Session = Depends(get_db_sessi
     }
 
 @app.post("/api/memory/demographics/{user_id}")
-async def update_user_demographics(
+def update_user_demographics(
     user_id: str,
     demographics: dict,
     db: Session = Depends(get_db_session)
@@ -439,32 +547,26 @@ async def update_user_demographics(
 # ITR FILING ENDPOINTS
 #--------------------------------------------------------------------------------------------------
 
-def run_itr_filing_task(user_id: str, pan: str, assessment_year: str, itr_type: str):
-    """Background task for ITR filing"""
-    try:
-        print(f"Starting background ITR filing for {user_id}")
-        itr_crew.file_itr_automatically(
-            user_id=user_id,
-            pan=pan,
-            assessment_year=assessment_year,
-            itr_type=itr_type
-        )
-        print(f"Background ITR filing completed for {user_id}")
-    except Exception as e:
-        print(f"Background ITR filing failed for {user_id}: {str(e)}")
+def _log_filing_result(user_id: str):
+    def callback(future):
+        exc = future.exception()
+        if exc:
+            logger.error(f"Background ITR filing failed for {user_id}: {exc}")
+        else:
+            logger.info(f"Background ITR filing completed for {user_id}")
+    return callback
 
 @app.post("/api/itr/file-automatically")
-async def file_itr_automatically(
+def file_itr_automatically(
     user_id: str,
     pan: str,
     assessment_year: str,
-    background_tasks: BackgroundTasks,
     itr_type: str = "ITR-1",
     db: Session = Depends(get_db_session)
 ):
     """
     Automatically file ITR using CrewAI agents and mock government APIs
-    
+
     This endpoint:
     1. Creates ITR filing record in PostgreSQL
     2. Uses CrewAI to orchestrate the entire filing process (in background)
@@ -479,15 +581,14 @@ async def file_itr_automatically(
             assessment_year=assessment_year,
             itr_type=itr_type
         )
-        
-        # Run CrewAI in background
-        background_tasks.add_task(
-            run_itr_filing_task,
-            user_id=user_id,
-            pan=pan,
-            assessment_year=assessment_year,
-            itr_type=itr_type
+
+        # Hand the crew run to the worker process pool; BackgroundTasks
+        # would keep the hour-long CrewAI run inside the web process,
+        # pinning a worker and blocking graceful restarts
+        future = CREW_POOL.submit(
+            run_filing_in_worker, user_id, pan, assessment_year, itr_type
         )
+        future.add_done_callback(_log_filing_result(user_id))
         
         return {
             "success": True,
@@ -499,7 +600,7 @@ async def file_itr_automatically(
 
 
 @app.get("/api/itr/prefill/{user_id}")
-async def get_itr_prefill(
+def get_itr_prefill(
     user_id: str,
     pan: str,
     assessment_year: str,
@@ -524,7 +625,7 @@ async def get_itr_prefill(
 
 
 @app.get("/api/itr/status/{filing_id}")
-async def get_filing_status(filing_id: int, db: Session = Depends(get_db_session)):
+def get_filing_status(filing_id: int, db: Session = Depends(get_db_session)):
     """Get ITR filing status from PostgreSQL"""
     itr_service = ITRService(db)
     summary = itr_service.get_filing_summary(filing_id)
@@ -536,14 +637,19 @@ async def get_filing_status(filing_id: int, db: Session = Depends(get_db_session
 
 
 @app.get("/api/itr/user/{user_id}")
-async def get_user_filings(
+def get_user_filings(
     user_id: str,
     assessment_year: Optional[str] = None,
+    limit: int = 50,
+    after_created_at: Optional[datetime] = None,
     db: Session = Depends(get_db_session)
 ):
-    """Get all ITR filings for a user"""
+    """Get a page of ITR filings for a user (keyset-paginated)"""
     itr_service = ITRService(db)
-    filings = itr_service.get_user_filings(user_id, assessment_year)
+    filings = itr_service.get_user_filings(
+        user_id, assessment_year,
+        limit=min(limit, 200), after_created_at=after_created_at
+    )
     
     return {
         "user_id": user_id,
@@ -555,8 +661,8 @@ async def get_user_filings(
                 "itr_type": f.itr_type,
                 "status": f.status.value,
                 "acknowledgement_number": f.acknowledgement_number,
-                "submitted_at": f.submitted_at.isoformat() if f.submitted_at else None,
-                "created_at": f.created_at.isoformat() if f.created_at else None
+                "submitted_at": f.submitted_at,
+                "created_at": f.created_at
             }
             for f in filings
         ]
@@ -564,7 +670,7 @@ async def get_user_filings(
 
 
 @app.get("/api/itr/stats/{user_id}")
-async def get_user_filing_stats(user_id: str, db: Session = Depends(get_db_session)):
+def get_user_filing_stats(user_id: str, db: Session = Depends(get_db_session)):
     """Get statistics about user's ITR filings"""
     itr_service = ITRService(db)
     stats = itr_service.get_user_filing_stats(user_id)
@@ -576,7 +682,7 @@ async def get_user_filing_stats(user_id: str, db: Session = Depends(get_db_sessi
 
 
 @app.delete("/api/itr/filing/{filing_id}")
-async def delete_filing(filing_id: int, db: Session = Depends(get_db_session)):
+def delete_filing(filing_id: int, db: Session = Depends(get_db_session)):
     """Delete an ITR filing record"""
     itr_service = ITRService(db)
     success = itr_service.delete_filing(filing_id)
@@ -592,7 +698,7 @@ async def delete_filing(filing_id: int, db: Session = Depends(get_db_session)):
 #--------------------------------------------------------------------------------------------------
 
 @app.post("/api/capital-gains/transaction")
-async def add_transaction(
+def add_transaction(
     request: models.TransactionRequest,
     db: Session = Depends(get_db_session)
 ):
@@ -625,7 +731,7 @@ async def add_transaction(
 
 
 @app.get("/api/capital-gains/portfolio/{user_id}")
-async def get_portfolio(user_id: str, db: Session = Depends(get_db_session)):
+def get_portfolio(user_id: str, db: Session = Depends(get_db_session)):
     """Get capital gains portfolio summary"""
     cg_service = CapitalGainsService(db)
     summary = cg_service.get_portfolio_summary(user_id)
@@ -634,7 +740,7 @@ async def get_portfolio(user_id: str, db: Session = Depends(get_db_session)):
 
 
 @app.get("/api/capital-gains/transactions/{user_id}")
-async def get_transactions(
+def get_transactions(
     user_id: str,
     asset_type: Optional[str] = None,
     db: Session = Depends(get_db_session)
@@ -650,9 +756,9 @@ async def get_transactions(
             "asset_type": t.asset_type,
             "type": t.transaction_type,
             "quantity": t.quantity,
-            "purchase_date": t.purchase_date.isoformat(),
+            "purchase_date": t.purchase_date,
             "purchase_price": t.purchase_price,
-            "sale_date": t.sale_date.isoformat() if t.sale_date else None,
+            "sale_date": t.sale_date,
             "sale_price": t.sale_price,
             "gain_loss": t.gain_loss,
             "tax": t.tax_applicable,
@@ -663,7 +769,7 @@ async def get_transactions(
 
 
 @app.delete("/api/capital-gains/transaction/{txn_id}")
-async def delete_transaction(txn_id: int, db: Session = Depends(get_db_session)):
+def delete_transaction(txn_id: int, db: Session = Depends(get_db_session)):
     """Delete a transaction"""
     cg_service = CapitalGainsService(db)
     success = cg_service.delete_transaction(txn_id)
@@ -672,13 +778,38 @@ async def delete_transaction(txn_id: int, db: Session = Depends(get_db_session))
         raise HTTPException(status_code=404, detail="Transaction not found")
     
     return {"message": "Transaction deleted successfully"}
+
+
+@app.get("/metrics")
+def metrics():
+    """Connection-pool utilization, for tuning DB_POOL_SIZE/DB_MAX_OVERFLOW"""
+    return {"db_pool": engine.pool.status()}
+
+
 @app.get("/")
-async def frontend():
-    return FileResponse("index.html")
+async def frontend(request: Request):
+    if request.headers.get("if-none-match") == INDEX_ETAG:
+        return Response(status_code=304)
+
+    return Response(
+        INDEX_BYTES,
+        media_type="text/html",
+        headers={"ETag": INDEX_ETAG, "Cache-Control": "public, max-age=60"}
+    )
 
 
 
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    # Import string (not the app object) so uvicorn can fork workers.
+    # State lives in PostgreSQL, so one worker per core is safe.
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=8000,
+        workers=os.cpu_count(),
+        loop="uvloop",
+        http="httptools",
+        proxy_headers=True
+    )
\ No newline at end of file
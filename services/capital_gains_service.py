@@ -5,15 +5,30 @@ Manages capital gains transactions and calculations
 
 from typing import Optional, Dict, Any, List
 from datetime import datetime
+import numpy as np
 from sqlalchemy.orm import Session
-from sqlalchemy import desc, func
+from sqlalchemy import and_, bindparam, case, delete, desc, func, insert, or_, select, update
 
 from database.models import CapitalGains, User
 from database.connection import get_db
 
+# Tax policy in one place: (is_equity, is_long_term) -> rate.
+# Equity LTCG 10% / STCG 15%; others LTCG 20% / STCG slab (placeholder
+# 30%). A tuple lookup replaces the four-way branch cascade.
+_EQUITY_ASSETS = frozenset({'equity', 'equity_mf'})
+_TAX_RATES = {
+    (True, True): 0.10,
+    (True, False): 0.15,
+    (False, True): 0.20,
+    (False, False): 0.30
+}
+
 class CapitalGainsService:
     """Service for managing capital gains transactions"""
     
+    # Instantiated per request; slots skip the per-instance dict
+    __slots__ = ("db",)
+
     def __init__(self, db: Session):
         self.db = db
     
@@ -21,67 +36,78 @@ class CapitalGainsService:
     # TRANSACTION MANAGEMENT
     # ========================================================================
     
-    def add_transaction(
-        self,
-        user_id: str,
+    @staticmethod
+    def _compute_gain_fields(
         asset_type: str,
         transaction_type: str,
         purchase_date: datetime,
         purchase_price: float,
         quantity: float,
-        asset_name: str,
-        sale_date: Optional[datetime] = None,
-        sale_price: Optional[float] = None,
-        notes: Optional[str] = None
-    ) -> CapitalGains:
-        """Add a new capital asset transaction"""
-        
-        # Calculate gains if sold
+        sale_date: Optional[datetime],
+        sale_price: Optional[float]
+    ) -> Dict[str, Any]:
+        """
+        Derive the computed columns for a transaction. Pure function so
+        the single-row and bulk paths share one set of rules.
+        """
         holding_period_days = None
         is_long_term = None
         gain_loss = None
         tax_applicable = None
-        
+
         if transaction_type == 'sell' or (sale_date and sale_price):
             if not sale_date:
                 sale_date = datetime.utcnow()
-            
+
             # Calculate holding period
             delta = sale_date - purchase_date
             holding_period_days = delta.days
-            
+
             # Determine term (simplified rules)
             # Equity: > 365 days is Long Term
             # Others: > 1095 days (3 years) is Long Term
-            if asset_type in ['equity', 'equity_mf']:
-                is_long_term = holding_period_days > 365
-            else:
-                is_long_term = holding_period_days > 1095
-            
+            is_equity = asset_type in _EQUITY_ASSETS
+            is_long_term = holding_period_days > (365 if is_equity else 1095)
+
             # Calculate Gain/Loss
             total_buy_cost = purchase_price * quantity
             total_sell_value = sale_price * quantity
             gain_loss = total_sell_value - total_buy_cost
-            
-            # Estimate Tax (Simplified)
+
+            # Estimate Tax (Simplified): rates live in _TAX_RATES
             if gain_loss > 0:
-                if asset_type in ['equity', 'equity_mf']:
-                    if is_long_term:
-                        # LTCG Equity: 10% (ignoring 1L exemption for individual txn)
-                        tax_applicable = gain_loss * 0.10
-                    else:
-                        # STCG Equity: 15%
-                        tax_applicable = gain_loss * 0.15
-                else:
-                    if is_long_term:
-                        # LTCG Others: 20% (approx)
-                        tax_applicable = gain_loss * 0.20
-                    else:
-                        # STCG Others: Slab rate (placeholder 30%)
-                        tax_applicable = gain_loss * 0.30
+                tax_applicable = gain_loss * _TAX_RATES[(is_equity, is_long_term)]
             else:
                 tax_applicable = 0
-        
+
+        return {
+            "sale_date": sale_date,
+            "holding_period_days": holding_period_days,
+            "is_long_term": is_long_term,
+            "gain_loss": gain_loss,
+            "tax_applicable": tax_applicable
+        }
+
+    def add_transaction(
+        self,
+        user_id: str,
+        asset_type: str,
+        transaction_type: str,
+        purchase_date: datetime,
+        purchase_price: float,
+        quantity: float,
+        asset_name: str,
+        sale_date: Optional[datetime] = None,
+        sale_price: Optional[float] = None,
+        notes: Optional[str] = None
+    ) -> CapitalGains:
+        """Add a new capital asset transaction"""
+
+        computed = self._compute_gain_fields(
+            asset_type, transaction_type, purchase_date,
+            purchase_price, quantity, sale_date, sale_price
+        )
+
         transaction = CapitalGains(
             user_id=user_id,
             asset_type=asset_type,
@@ -90,21 +116,167 @@ class CapitalGainsService:
             purchase_price=purchase_price,
             quantity=quantity,
             asset_name=asset_name,
-            sale_date=sale_date,
             sale_price=sale_price,
             notes=notes,
-            holding_period_days=holding_period_days,
-            is_long_term=is_long_term,
-            gain_loss=gain_loss,
-            tax_applicable=tax_applicable
+            **computed
         )
-        
+
         self.db.add(transaction)
         self.db.commit()
         self.db.refresh(transaction)
-        
+
         return transaction
     
+    def add_transactions_bulk(self, user_id: str, transactions: List[Dict[str, Any]]) -> List[int]:
+        """
+        Bulk-insert transactions (e.g. a broker CSV import).
+
+        The derived columns are computed with NumPy across all sold rows
+        at once, and all rows go to the database in a single multi-row
+        INSERT RETURNING instead of one ORM add/commit/refresh per
+        transaction. Each dict takes the same fields as add_transaction;
+        returns the new row ids in input order.
+        """
+        records = []
+        sold = []
+
+        for txn in transactions:
+            record = {
+                "user_id": user_id,
+                "asset_type": txn["asset_type"],
+                "transaction_type": txn["transaction_type"],
+                "purchase_date": txn["purchase_date"],
+                "purchase_price": txn["purchase_price"],
+                "quantity": txn["quantity"],
+                "asset_name": txn.get("asset_name"),
+                "sale_date": txn.get("sale_date"),
+                "sale_price": txn.get("sale_price"),
+                "notes": txn.get("notes"),
+                "holding_period_days": None,
+                "is_long_term": None,
+                "gain_loss": None,
+                "tax_applicable": None
+            }
+
+            if txn["transaction_type"] == 'sell' or (txn.get("sale_date") and txn.get("sale_price")):
+                if not record["sale_date"]:
+                    record["sale_date"] = datetime.utcnow()
+                sold.append(record)
+
+            records.append(record)
+
+        if sold:
+            purchase_dates = np.array([r["purchase_date"] for r in sold], dtype='datetime64[s]')
+            sale_dates = np.array([r["sale_date"] for r in sold], dtype='datetime64[s]')
+            holding_days = ((sale_dates - purchase_dates) / np.timedelta64(1, 'D')).astype(int)
+
+            # Same rules as add_transaction: equity > 365 days is long
+            # term, everything else > 1095 days
+            is_equity = np.array([r["asset_type"] in _EQUITY_ASSETS for r in sold])
+            is_long_term = holding_days > np.where(is_equity, 365, 1095)
+
+            quantities = np.array([r["quantity"] for r in sold], dtype=float)
+            gain_loss = (
+                np.array([r["sale_price"] for r in sold], dtype=float)
+                - np.array([r["purchase_price"] for r in sold], dtype=float)
+            ) * quantities
+
+            # Same simplified rates as add_transaction
+            rates = np.where(
+                is_equity,
+                np.where(is_long_term, 0.10, 0.15),
+                np.where(is_long_term, 0.20, 0.30)
+            )
+            tax_applicable = np.where(gain_loss > 0, gain_loss * rates, 0.0)
+
+            for record, days, long_term, gain, tax in zip(sold, holding_days, is_long_term, gain_loss, tax_applicable):
+                record["holding_period_days"] = int(days)
+                record["is_long_term"] = bool(long_term)
+                record["gain_loss"] = float(gain)
+                record["tax_applicable"] = float(tax)
+
+        if not records:
+            return []
+
+        result = self.db.execute(
+            insert(CapitalGains).returning(CapitalGains.id), records
+        )
+        ids = [row[0] for row in result]
+        self.db.commit()
+        return ids
+
+    def recompute_gains_bulk(self, user_id: str) -> int:
+        """
+        Re-derive the computed columns for every sold transaction of a
+        user (end-of-year recompute, rule changes). Rows load as Core
+        tuples straight into NumPy arrays and write back through one
+        executemany UPDATE, so the cost is a few array ops rather than a
+        Python branch per row.
+        """
+        rows = self.db.execute(
+            select(
+                CapitalGains.id,
+                CapitalGains.asset_type,
+                CapitalGains.purchase_date,
+                CapitalGains.purchase_price,
+                CapitalGains.quantity,
+                CapitalGains.sale_date,
+                CapitalGains.sale_price
+            ).where(
+                CapitalGains.user_id == user_id,
+                CapitalGains.sale_date.isnot(None),
+                CapitalGains.sale_price.isnot(None)
+            )
+        ).all()
+
+        if not rows:
+            return 0
+
+        purchase_dates = np.array([r.purchase_date for r in rows], dtype='datetime64[s]')
+        sale_dates = np.array([r.sale_date for r in rows], dtype='datetime64[s]')
+        holding_days = ((sale_dates - purchase_dates) / np.timedelta64(1, 'D')).astype(int)
+
+        is_equity = np.array([r.asset_type in _EQUITY_ASSETS for r in rows])
+        is_long_term = holding_days > np.where(is_equity, 365, 1095)
+
+        gain_loss = (
+            np.array([r.sale_price for r in rows], dtype=float)
+            - np.array([r.purchase_price for r in rows], dtype=float)
+        ) * np.array([r.quantity for r in rows], dtype=float)
+
+        rates = np.where(
+            is_equity,
+            np.where(is_long_term, 0.10, 0.15),
+            np.where(is_long_term, 0.20, 0.30)
+        )
+        tax_applicable = np.where(gain_loss > 0, gain_loss * rates, 0.0)
+
+        params = [
+            {
+                "b_id": row.id,
+                "b_days": int(days),
+                "b_long_term": bool(long_term),
+                "b_gain": float(gain),
+                "b_tax": float(tax)
+            }
+            for row, days, long_term, gain, tax
+            in zip(rows, holding_days, is_long_term, gain_loss, tax_applicable)
+        ]
+        self.db.execute(
+            update(CapitalGains)
+            .where(CapitalGains.id == bindparam("b_id"))
+            .values(
+                holding_period_days=bindparam("b_days"),
+                is_long_term=bindparam("b_long_term"),
+                gain_loss=bindparam("b_gain"),
+                tax_applicable=bindparam("b_tax")
+            )
+            .execution_options(synchronize_session=False),
+            params
+        )
+        self.db.commit()
+        return len(params)
+
     def get_transactions(
         self,
         user_id: str,
@@ -120,16 +292,32 @@ class CapitalGainsService:
             query = query.filter(CapitalGains.asset_type == asset_type)
         
         if year:
-            # Filter by sale date year if sold, else purchase date
-            # This is a bit complex, let's just filter by created_at for now or simple logic
-            pass
-            
+            # Financial year window: Apr 1 of `year` through Mar 31 of
+            # the next. Sold rows match on sale_date, open positions on
+            # purchase_date. Plain range predicates (no extract()) so
+            # the (user_id, purchase_date) index stays usable.
+            start = datetime(year, 4, 1)
+            end = datetime(year + 1, 4, 1)
+            query = query.filter(or_(
+                and_(
+                    CapitalGains.sale_date.isnot(None),
+                    CapitalGains.sale_date >= start,
+                    CapitalGains.sale_date < end
+                ),
+                and_(
+                    CapitalGains.sale_date.is_(None),
+                    CapitalGains.purchase_date >= start,
+                    CapitalGains.purchase_date < end
+                )
+            ))
+
+
         return query.order_by(desc(CapitalGains.purchase_date)).all()
     
     def get_portfolio_summary(self, user_id: str) -> Dict[str, Any]:
         """Get summary of capital gains portfolio"""
-        transactions = self.get_transactions(user_id)
-        
+        # Aggregate in SQL: two grouped queries instead of hydrating
+        # every transaction row just to sum columns in Python
         summary = {
             "total_invested": 0.0,
             "current_value": 0.0, # Only for sold items in this simple model
@@ -139,29 +327,42 @@ class CapitalGainsService:
             "stcg_total": 0.0,
             "ltcg_total": 0.0
         }
-        
-        for txn in transactions:
-            # Add to allocation
-            summary["asset_allocation"][txn.asset_type] = summary["asset_allocation"].get(txn.asset_type, 0) + (txn.purchase_price * txn.quantity)
-            
-            summary["total_invested"] += (txn.purchase_price * txn.quantity)
-            
-            if txn.gain_loss is not None:
-                summary["total_gain_loss"] += txn.gain_loss
-                summary["total_tax_liability"] += (txn.tax_applicable or 0)
-                
-                if txn.is_long_term:
-                    summary["ltcg_total"] += txn.gain_loss
-                else:
-                    summary["stcg_total"] += txn.gain_loss
-                    
+
+        allocation = self.db.query(
+            CapitalGains.asset_type,
+            func.sum(CapitalGains.purchase_price * CapitalGains.quantity)
+        ).filter(
+            CapitalGains.user_id == user_id
+        ).group_by(CapitalGains.asset_type).all()
+
+        for asset_type, invested in allocation:
+            summary["asset_allocation"][asset_type] = float(invested)
+            summary["total_invested"] += float(invested)
+
+        totals = self.db.query(
+            func.coalesce(func.sum(CapitalGains.gain_loss), 0.0),
+            func.coalesce(func.sum(CapitalGains.tax_applicable), 0.0),
+            func.coalesce(func.sum(
+                case((CapitalGains.is_long_term == True, CapitalGains.gain_loss), else_=0.0)
+            ), 0.0),
+            func.coalesce(func.sum(
+                case((CapitalGains.is_long_term == False, CapitalGains.gain_loss), else_=0.0)
+            ), 0.0)
+        ).filter(CapitalGains.user_id == user_id).one()
+
+        summary["total_gain_loss"] = float(totals[0])
+        summary["total_tax_liability"] = float(totals[1])
+        summary["ltcg_total"] = float(totals[2])
+        summary["stcg_total"] = float(totals[3])
+
         return summary
         
     def delete_transaction(self, transaction_id: int) -> bool:
         """Delete a transaction"""
-        txn = self.db.query(CapitalGains).filter(CapitalGains.id == transaction_id).first()
-        if txn:
-            self.db.delete(txn)
-            self.db.commit()
-            return True
-        return False
+        # Single DELETE; rowcount says whether the row existed, so no
+        # preliminary SELECT is needed
+        result = self.db.execute(
+            delete(CapitalGains).where(CapitalGains.id == transaction_id)
+        )
+        self.db.commit()
+        return result.rowcount > 0
@@ -5,14 +5,44 @@ Extracts user demographic information from conversation messages using LLM
 
 from typing import Dict, Any, Optional
 from llm.openai_client import OpenAIClient
-import json
+import numpy as np
+import orjson
 import re
 
+# Compiled once; _parse_json_response runs per LLM response
+_FENCED_JSON_RE = re.compile(r'```(?:json)?\s*(\{.*?\})\s*```', re.DOTALL)
+_BARE_JSON_RE = re.compile(r'\{[^{}]*\}')
+
+# Exemplars of demographic mentions, one or two per slot. Message
+# batches that don't resemble any of these skip the extraction LLM
+# call entirely - an embedding lookup is orders of magnitude cheaper
+# than a completion.
+_DEMOGRAPHIC_EXEMPLARS = (
+    "I am 34 years old",
+    "I'm in my mid thirties",
+    "I am a man",   # gender
+    "I work as a software engineer",
+    "I run my own business as a freelancer",
+    "I live in Mumbai",
+    "I moved to Bangalore last year",
+    "I am married with two children",
+    "I am single",
+    "I completed my MBA",
+    "I earn about 12 lakhs per year",
+    "I support my spouse and my parents",
+)
+_SIMILARITY_THRESHOLD = 0.35
+
+# Filled on first use (needs an API round-trip); unit-normalized rows
+_exemplar_matrix: Optional[np.ndarray] = None
+
 
 class DemographicsExtractor:
     """Extract user demographics from conversation messages"""
     
-    EXTRACTION_PROMPT = """Analyze the following conversation messages and extract any demographic information about the user.
+    # Static prompt halves concatenated around the messages text; plain
+    # concatenation skips str.format's template scan on every call
+    _PROMPT_PREFIX = """Analyze the following conversation messages and extract any demographic information about the user.
 
 Extract ONLY the information that is explicitly mentioned or can be clearly inferred. Do not make assumptions.
 
@@ -27,13 +57,25 @@ Demographics to extract:
 - dependents: Number or mention of dependents (e.g., "2 children", "spouse and parents")
 
 Messages:
-{messages}
+"""
 
-Return ONLY a valid JSON object with the extracted demographics. If nothing is found, return an empty object {{}}.
-Example: {{"age": "35", "occupation": "software engineer", "location": "Bangalore"}}
+    _PROMPT_SUFFIX = """
+
+Return ONLY a valid JSON object with the extracted demographics. If nothing is found, return an empty object {}.
+Example: {"age": "35", "occupation": "software engineer", "location": "Bangalore"}
 
 JSON Response:"""
 
+    # The slots the extraction prompt asks for; once all are known the
+    # LLM call is skipped entirely
+    DEMOGRAPHIC_KEYS = (
+        "age", "gender", "occupation", "location",
+        "marital_status", "education", "income_bracket", "dependents"
+    )
+
+    # Instantiated per request; slots skip the per-instance dict
+    __slots__ = ("llm",)
+
     def __init__(self, llm_client: OpenAIClient):
         self.llm = llm_client
     
@@ -54,16 +96,28 @@ JSON Response:"""
         """
         if not messages:
             return None
-        
+
+        # Everything already known: the expensive part is the OpenAI
+        # call, so don't make it when there is nothing left to learn
+        if existing_demographics and all(
+            str(existing_demographics.get(key) or "").strip()
+            for key in self.DEMOGRAPHIC_KEYS
+        ):
+            return None
+
         # Format messages for the prompt
         messages_text = "\n".join([
             f"{msg.get('role', 'user')}: {msg.get('content', '')}"
             for msg in messages
         ])
         
+        # Cheap relevance gate before the expensive completion
+        if not await self._mentions_demographics(messages_text):
+            return None
+
         # Generate extraction prompt
-        prompt = self.EXTRACTION_PROMPT.format(messages=messages_text)
-        
+        prompt = f"{self._PROMPT_PREFIX}{messages_text}{self._PROMPT_SUFFIX}"
+
         try:
             # Call LLM to extract demographics
             response = await self.llm.generate(prompt, max_tokens=300)
@@ -75,40 +129,62 @@ JSON Response:"""
             if demographics:
                 demographics = {k: v for k, v in demographics.items() if v and str(v).strip()}
             
-            # Only return new information
+            # Only return new information: items() views diff in C, and
+            # a pair differs when the key is new or the value changed
             if existing_demographics and demographics:
-                new_demographics = {}
-                for key, value in demographics.items():
-                    if key not in existing_demographics or existing_demographics[key] != value:
-                        new_demographics[key] = value
+                new_demographics = dict(
+                    demographics.items() - existing_demographics.items()
+                )
                 return new_demographics if new_demographics else None
-            
+
             return demographics if demographics else None
             
         except Exception as e:
             print(f"Demographics extraction error: {str(e)}")
             return None
     
+    async def _mentions_demographics(self, messages_text: str) -> bool:
+        """
+        Embed the batch and compare against the exemplar sentences;
+        conversations that don't resemble any demographic mention skip
+        the extraction call. Fails open so an embedding hiccup never
+        loses an extraction.
+        """
+        global _exemplar_matrix
+        try:
+            if _exemplar_matrix is None:
+                vectors = await self.llm.embed(list(_DEMOGRAPHIC_EXEMPLARS))
+                matrix = np.array(vectors, dtype=np.float32)
+                matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+                _exemplar_matrix = matrix
+
+            batch = np.array((await self.llm.embed([messages_text]))[0], dtype=np.float32)
+            batch /= np.linalg.norm(batch)
+            return float(np.max(_exemplar_matrix @ batch)) >= _SIMILARITY_THRESHOLD
+        except Exception as e:
+            print(f"Demographics prefilter error (continuing without it): {str(e)}")
+            return True
+
     def _parse_json_response(self, response: str) -> Optional[Dict[str, Any]]:
         """Parse JSON from LLM response"""
         try:
             # Try direct JSON parse
-            return json.loads(response.strip())
-        except json.JSONDecodeError:
+            return orjson.loads(response.strip())
+        except orjson.JSONDecodeError:
             # Try to extract JSON from markdown code blocks
-            json_match = re.search(r'```(?:json)?\s*(\{.*?\})\s*```', response, re.DOTALL)
+            json_match = _FENCED_JSON_RE.search(response)
             if json_match:
                 try:
-                    return json.loads(json_match.group(1))
-                except json.JSONDecodeError:
+                    return orjson.loads(json_match.group(1))
+                except orjson.JSONDecodeError:
                     pass
-            
+
             # Try to find JSON object in the text
-            json_match = re.search(r'\{[^{}]*\}', response)
+            json_match = _BARE_JSON_RE.search(response)
             if json_match:
                 try:
-                    return json.loads(json_match.group(0))
-                except json.JSONDecodeError:
+                    return orjson.loads(json_match.group(0))
+                except orjson.JSONDecodeError:
                     pass
-            
+
             return None
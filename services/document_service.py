@@ -6,14 +6,18 @@ Manages document storage and metadata in PostgreSQL
 from typing import Optional, List, Dict, Any
 from datetime import datetime
 from sqlalchemy.orm import Session
-from sqlalchemy import desc
+from sqlalchemy import delete, desc
 
 from database.models import Document
 from database.connection import get_db
+from database.queries import GET_USER_DOCUMENTS, GET_USER_DOCUMENTS_AFTER
 
 class DocumentService:
     """Service for managing user documents"""
     
+    # Instantiated per request; slots skip the per-instance dict
+    __slots__ = ("db",)
+
     def __init__(self, db: Session):
         self.db = db
     
@@ -24,16 +28,18 @@ class DocumentService:
         file_path: str,
         document_type: str = "general",
         file_size: Optional[int] = None,
+        sha256: Optional[str] = None,
         extracted_data: Optional[Dict] = None
     ) -> Document:
         """Add a new document record"""
-        
+
         doc = Document(
             user_id=user_id,
             file_name=file_name,
             file_path=file_path,
             document_type=document_type,
             file_size=file_size,
+            sha256=sha256,
             extracted_data=extracted_data
         )
         
@@ -43,11 +49,32 @@ class DocumentService:
         
         return doc
     
-    def get_user_documents(self, user_id: str) -> List[Document]:
-        """Get all documents for a user"""
+    def find_by_hash(self, user_id: str, sha256: str) -> Optional[Document]:
+        """Find a user's document by content digest"""
         return self.db.query(Document).filter(
-            Document.user_id == user_id
-        ).order_by(desc(Document.uploaded_at)).all()
+            Document.user_id == user_id,
+            Document.sha256 == sha256
+        ).first()
+
+    def get_user_documents(
+        self,
+        user_id: str,
+        limit: int = 50,
+        after_uploaded_at: Optional[datetime] = None
+    ) -> List[Document]:
+        """
+        Get a page of the user's documents, newest first. Pass the
+        uploaded_at of the last row as after_uploaded_at to fetch the
+        next page (keyset pagination).
+        """
+        if after_uploaded_at is not None:
+            return self.db.execute(
+                GET_USER_DOCUMENTS_AFTER,
+                {"uid": user_id, "limit": limit, "after": after_uploaded_at}
+            ).scalars().all()
+        return self.db.execute(
+            GET_USER_DOCUMENTS, {"uid": user_id, "limit": limit}
+        ).scalars().all()
     
     def get_document(self, document_id: int) -> Optional[Document]:
         """Get document by ID"""
@@ -55,9 +82,9 @@ class DocumentService:
     
     def delete_document(self, document_id: int) -> bool:
         """Delete a document record"""
-        doc = self.get_document(document_id)
-        if doc:
-            self.db.delete(doc)
-            self.db.commit()
-            return True
-        return False
+        # Single DELETE; rowcount replaces the existence SELECT
+        result = self.db.execute(
+            delete(Document).where(Document.id == document_id)
+        )
+        self.db.commit()
+        return result.rowcount > 0
@@ -6,17 +6,27 @@ Manages ITR filing process and stores data in PostgreSQL
 from typing import Optional, Dict, Any, List
 from datetime import datetime
 from sqlalchemy.orm import Session
-from sqlalchemy import desc
+from sqlalchemy import delete, desc, func, update
 
 from database.models import ITRFiling, ITRStatus, User
 from database.connection import get_db
 
+# Enum member -> wire string, built once; a dict hit is cheaper than
+# the .value descriptor chain in per-row code
+_STATUS_VALUE = {member: member.value for member in ITRStatus}
+
 
 class ITRService:
     """Service for managing ITR filings in PostgreSQL"""
     
+    # Instantiated per request; slots skip the per-instance dict
+    __slots__ = ("db", "_filing_cache")
+
     def __init__(self, db: Session):
         self.db = db
+        # Request-scoped memo for get_itr_filing: chained update calls
+        # in the filing flow reuse the row instead of re-selecting it
+        self._filing_cache: Dict[int, ITRFiling] = {}
     
     # ========================================================================
     # ITR FILING OPERATIONS
@@ -44,24 +54,38 @@ class ITRService:
     
     def get_itr_filing(self, filing_id: int) -> Optional[ITRFiling]:
         """Get ITR filing by ID"""
-        return self.db.query(ITRFiling).filter(
-            ITRFiling.id == filing_id
-        ).first()
+        filing = self._filing_cache.get(filing_id)
+        if filing is None:
+            filing = self.db.query(ITRFiling).filter(
+                ITRFiling.id == filing_id
+            ).first()
+            if filing is not None:
+                self._filing_cache[filing_id] = filing
+        return filing
     
     def get_user_filings(
         self,
         user_id: str,
-        assessment_year: Optional[str] = None
+        assessment_year: Optional[str] = None,
+        limit: int = 50,
+        after_created_at: Optional[datetime] = None
     ) -> List[ITRFiling]:
-        """Get all ITR filings for a user"""
+        """
+        Get a page of the user's ITR filings, newest first. Pass the
+        created_at of the last row as after_created_at for the next
+        page (keyset pagination over the created_at DESC index).
+        """
         query = self.db.query(ITRFiling).filter(
             ITRFiling.user_id == user_id
         )
-        
+
         if assessment_year:
             query = query.filter(ITRFiling.assessment_year == assessment_year)
-        
-        return query.order_by(desc(ITRFiling.created_at)).all()
+
+        if after_created_at is not None:
+            query = query.filter(ITRFiling.created_at < after_created_at)
+
+        return query.order_by(desc(ITRFiling.created_at)).limit(limit).all()
     
     def get_latest_filing(
         self,
@@ -73,39 +97,58 @@ class ITRService:
             ITRFiling.user_id == user_id,
             ITRFiling.assessment_year == assessment_year
         ).order_by(desc(ITRFiling.created_at)).first()
-    
+
+    def get_latest_filing_id(
+        self,
+        user_id: str,
+        assessment_year: str
+    ) -> Optional[int]:
+        """Get just the id of the latest filing, skipping ORM hydration"""
+        row = self.db.query(ITRFiling.id).filter(
+            ITRFiling.user_id == user_id,
+            ITRFiling.assessment_year == assessment_year
+        ).order_by(desc(ITRFiling.created_at)).first()
+        return row.id if row else None
+
     # ========================================================================
     # UPDATE ITR STATUS
     # ========================================================================
     
+    def _patch(self, filing_id: int, **cols):
+        """
+        Apply column values with a single targeted UPDATE. The old
+        per-field updaters each did a SELECT, an attribute mutation, and
+        a commit; this is one statement and one round-trip per call.
+        """
+        self.db.execute(
+            update(ITRFiling)
+            .where(ITRFiling.id == filing_id)
+            .values(**cols)
+            .execution_options(synchronize_session=False)
+        )
+        self.db.commit()
+        # The Core UPDATE bypasses the unit of work, so any memoized ORM
+        # copy of this row is stale - drop it and expire its state
+        cached = self._filing_cache.pop(filing_id, None)
+        if cached is not None:
+            self.db.expire(cached)
+
     def update_session_id(self, filing_id: int, session_id: str):
         """Update session ID"""
-        filing = self.get_itr_filing(filing_id)
-        if filing:
-            filing.session_id = session_id
-            self.db.commit()
-    
+        self._patch(filing_id, session_id=session_id)
+
     def update_client_reference(self, filing_id: int, client_ref_id: str):
         """Update client reference ID"""
-        filing = self.get_itr_filing(filing_id)
-        if filing:
-            filing.client_reference_id = client_ref_id
-            self.db.commit()
-    
+        self._patch(filing_id, client_reference_id=client_ref_id)
+
     def update_prefill_data(self, filing_id: int, prefill_data: Dict[str, Any]):
         """Store prefill data"""
-        filing = self.get_itr_filing(filing_id)
-        if filing:
-            filing.prefill_data = prefill_data
-            self.db.commit()
-    
+        self._patch(filing_id, prefill_data=prefill_data)
+
     def update_itr_data(self, filing_id: int, itr_data: Dict[str, Any]):
         """Store complete ITR data"""
-        filing = self.get_itr_filing(filing_id)
-        if filing:
-            filing.itr_data = itr_data
-            self.db.commit()
-    
+        self._patch(filing_id, itr_data=itr_data)
+
     def update_validation(
         self,
         filing_id: int,
@@ -113,46 +156,66 @@ class ITRService:
         errors: Optional[List[Dict]] = None
     ):
         """Update validation status"""
-        filing = self.get_itr_filing(filing_id)
-        if filing:
-            if validation_id:
-                filing.validation_id = validation_id
-                filing.status = ITRStatus.VALIDATED
-                filing.validated_at = datetime.utcnow()
-            else:
-                filing.validation_errors = errors
-            self.db.commit()
-    
+        if validation_id:
+            self._patch(
+                filing_id,
+                validation_id=validation_id,
+                status=ITRStatus.VALIDATED,
+                validated_at=datetime.utcnow()
+            )
+        else:
+            self._patch(filing_id, validation_errors=errors)
+
+    def finalize_validation(
+        self,
+        filing_id: int,
+        validation_id: str,
+        prefill_data: Optional[Dict[str, Any]] = None,
+        itr_data: Optional[Dict[str, Any]] = None
+    ):
+        """
+        Record a successful validation together with its data payloads
+        in one UPDATE and one commit. The filing flow previously called
+        update_prefill_data, update_itr_data, and update_validation in
+        sequence - three transactions and three WAL flushes for what is
+        logically one state change. The timestamp comes from func.now()
+        so the database clock is authoritative.
+        """
+        cols = {
+            "validation_id": validation_id,
+            "status": ITRStatus.VALIDATED,
+            "validated_at": func.now()
+        }
+        if prefill_data is not None:
+            cols["prefill_data"] = prefill_data
+        if itr_data is not None:
+            cols["itr_data"] = itr_data
+        self._patch(filing_id, **cols)
+
     def update_draft(self, filing_id: int, draft_id: str):
         """Update draft ID"""
-        filing = self.get_itr_filing(filing_id)
-        if filing:
-            filing.draft_id = draft_id
-            self.db.commit()
-    
+        self._patch(filing_id, draft_id=draft_id)
+
     def update_verification_mode(self, filing_id: int, mode: str):
         """Update verification mode"""
-        filing = self.get_itr_filing(filing_id)
-        if filing:
-            filing.verification_mode = mode
-            self.db.commit()
-    
+        self._patch(filing_id, verification_mode=mode)
+
     def update_submission(self, filing_id: int, ack_number: str):
         """Update submission details"""
-        filing = self.get_itr_filing(filing_id)
-        if filing:
-            filing.acknowledgement_number = ack_number
-            filing.status = ITRStatus.SUBMITTED
-            filing.submitted_at = datetime.utcnow()
-            self.db.commit()
-    
+        self._patch(
+            filing_id,
+            acknowledgement_number=ack_number,
+            status=ITRStatus.SUBMITTED,
+            submitted_at=datetime.utcnow()
+        )
+
     def update_acknowledgement(self, filing_id: int):
         """Mark acknowledgement as received"""
-        filing = self.get_itr_filing(filing_id)
-        if filing:
-            filing.status = ITRStatus.ACKNOWLEDGED
-            filing.acknowledged_at = datetime.utcnow()
-            self.db.commit()
+        self._patch(
+            filing_id,
+            status=ITRStatus.ACKNOWLEDGED,
+            acknowledged_at=datetime.utcnow()
+        )
     
     # ========================================================================
     # STATUS QUERIES
@@ -161,21 +224,43 @@ class ITRService:
     def get_filing_status(self, filing_id: int) -> Optional[str]:
         """Get current status of ITR filing"""
         filing = self.get_itr_filing(filing_id)
-        return filing.status.value if filing else None
+        return _STATUS_VALUE[filing.status] if filing else None
     
     def get_filing_summary(self, filing_id: int) -> Optional[Dict[str, Any]]:
         """Get complete summary of ITR filing"""
-        filing = self.get_itr_filing(filing_id)
-        
+        # Project the scalar columns and reduce the JSON blobs to
+        # presence flags in SQL, so prefill/ITR payloads (potentially
+        # hundreds of KB) never leave the database for a summary
+        filing = self.db.query(
+            ITRFiling.id,
+            ITRFiling.user_id,
+            ITRFiling.assessment_year,
+            ITRFiling.itr_type,
+            ITRFiling.status,
+            ITRFiling.session_id,
+            ITRFiling.client_reference_id,
+            ITRFiling.validation_id,
+            ITRFiling.draft_id,
+            ITRFiling.acknowledgement_number,
+            ITRFiling.verification_mode,
+            ITRFiling.created_at,
+            ITRFiling.validated_at,
+            ITRFiling.submitted_at,
+            ITRFiling.acknowledged_at,
+            ITRFiling.prefill_data.isnot(None).label("has_prefill_data"),
+            ITRFiling.itr_data.isnot(None).label("has_itr_data"),
+            ITRFiling.validation_errors.isnot(None).label("has_errors")
+        ).filter(ITRFiling.id == filing_id).first()
+
         if not filing:
             return None
-        
+
         return {
             "id": filing.id,
             "user_id": filing.user_id,
             "assessment_year": filing.assessment_year,
             "itr_type": filing.itr_type,
-            "status": filing.status.value,
+            "status": _STATUS_VALUE[filing.status],
             "session_id": filing.session_id,
             "client_reference_id": filing.client_reference_id,
             "validation_id": filing.validation_id,
@@ -186,41 +271,48 @@ class ITRService:
             "validated_at": filing.validated_at.isoformat() if filing.validated_at else None,
             "submitted_at": filing.submitted_at.isoformat() if filing.submitted_at else None,
             "acknowledged_at": filing.acknowledged_at.isoformat() if filing.acknowledged_at else None,
-            "has_prefill_data": filing.prefill_data is not None,
-            "has_itr_data": filing.itr_data is not None,
-            "has_errors": filing.validation_errors is not None
+            "has_prefill_data": filing.has_prefill_data,
+            "has_itr_data": filing.has_itr_data,
+            "has_errors": filing.has_errors
         }
     
     def get_user_filing_stats(self, user_id: str) -> Dict[str, Any]:
         """Get statistics about user's ITR filings"""
-        filings = self.get_user_filings(user_id)
-        
+        # Counts come from GROUP BY queries and the latest filing from a
+        # four-column LIMIT 1, instead of hydrating every filing row
+        by_status = self.db.query(
+            ITRFiling.status, func.count()
+        ).filter(
+            ITRFiling.user_id == user_id
+        ).group_by(ITRFiling.status).all()
+
+        by_year = self.db.query(
+            ITRFiling.assessment_year, func.count()
+        ).filter(
+            ITRFiling.user_id == user_id
+        ).group_by(ITRFiling.assessment_year).all()
+
         stats = {
-            "total_filings": len(filings),
-            "by_status": {},
-            "by_year": {},
+            "total_filings": sum(count for _, count in by_status),
+            "by_status": {_STATUS_VALUE[status]: count for status, count in by_status},
+            "by_year": dict(by_year),
             "latest_filing": None
         }
-        
-        for filing in filings:
-            # Count by status
-            status = filing.status.value
-            stats["by_status"][status] = stats["by_status"].get(status, 0) + 1
-            
-            # Count by year
-            year = filing.assessment_year
-            stats["by_year"][year] = stats["by_year"].get(year, 0) + 1
-        
-        # Get latest filing
-        if filings:
-            latest = filings[0]
+
+        latest = self.db.query(
+            ITRFiling.id, ITRFiling.assessment_year, ITRFiling.status, ITRFiling.created_at
+        ).filter(
+            ITRFiling.user_id == user_id
+        ).order_by(desc(ITRFiling.created_at)).first()
+
+        if latest:
             stats["latest_filing"] = {
                 "id": latest.id,
                 "assessment_year": latest.assessment_year,
-                "status": latest.status.value,
+                "status": _STATUS_VALUE[latest.status],
                 "created_at": latest.created_at.isoformat() if latest.created_at else None
             }
-        
+
         return stats
     
     # ========================================================================
@@ -229,9 +321,11 @@ class ITRService:
     
     def delete_filing(self, filing_id: int) -> bool:
         """Delete an ITR filing"""
-        filing = self.get_itr_filing(filing_id)
-        if filing:
-            self.db.delete(filing)
-            self.db.commit()
-            return True
-        return False
+        # Single DELETE; rowcount replaces the existence SELECT.
+        # Filings have no dependent rows, so no ORM cascade is lost.
+        result = self.db.execute(
+            delete(ITRFiling).where(ITRFiling.id == filing_id)
+        )
+        self.db.commit()
+        self._filing_cache.pop(filing_id, None)
+        return result.rowcount > 0
@@ -4,16 +4,84 @@ Handles short-term (session-based) and long-term (persistent) memory
 """
 
 from typing import List, Dict, Optional, Any
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, desc
+from sqlalchemy import Integer, and_, cast, desc, func, insert, update
+from sqlalchemy.dialects.postgresql import JSONB, array
 import json
+import re
+import time
 
 from database.models import (
     ConversationSession, Message, UserMemory, MessageRole, User
 )
 from database.connection import get_db
 
+# Enum member -> wire string, built once; a dict hit is cheaper than
+# the .value descriptor chain in per-row code
+_ROLE_VALUE = {member: member.value for member in MessageRole}
+
+_TOKEN_RE = re.compile(r"\S+")
+
+
+def _estimate_tokens(content: str) -> int:
+    """Rough token estimate: word count, exactly len(content.split())
+    but without materializing the throwaway list of substrings"""
+    return sum(1 for _ in _TOKEN_RE.finditer(content))
+
+
+# get_full_context cache, module-level so it outlives the per-request
+# service instances (same in-process LRU+TTL pattern as the OpenAI
+# response cache). The key embeds the session's last_activity stamp;
+# add_message bumps last_activity, so a new message makes the old key
+# unreachable and the entry ages out. Cached contexts are shared -
+# callers must treat them as read-only.
+_CONTEXT_CACHE: "OrderedDict[tuple, tuple]" = OrderedDict()
+_CONTEXT_CACHE_MAX = 512
+_CONTEXT_CACHE_TTL = 60.0
+
+# Bucket bound for the frequent_intents sketch; keeps the JSONB column
+# (rewritten on every update) a fixed size however many distinct
+# intents a user accumulates
+_INTENT_SKETCH_SIZE = 32
+
+
+def _bump_histogram(deltas: Dict[str, int]):
+    """
+    SQL expression incrementing the session intent histogram by the
+    given per-intent deltas, entirely server-side via nested
+    jsonb_set - no read-modify-write from Python.
+    """
+    expr = func.coalesce(ConversationSession.intent_histogram, cast('{}', JSONB))
+    for intent, delta in deltas.items():
+        current = func.coalesce(
+            ConversationSession.intent_histogram[intent].astext, '0'
+        )
+        expr = func.jsonb_set(
+            expr,
+            array([intent]),
+            func.to_jsonb(cast(current, Integer) + delta)
+        )
+    return expr
+
+
+def _count_intent(counts: Dict[str, int], intent: str, delta: int = 1) -> None:
+    """
+    Space-Saving increment (Metwally): tracked intents bump in place;
+    a new intent takes a free bucket, or evicts the minimum-count
+    entry and inherits its count. Approximate for the tail, exact for
+    the heavy hitters, and never more than _INTENT_SKETCH_SIZE keys.
+    """
+    if intent in counts:
+        counts[intent] += delta
+    elif len(counts) < _INTENT_SKETCH_SIZE:
+        counts[intent] = delta
+    else:
+        evicted = min(counts, key=counts.get)
+        floor = counts.pop(evicted)
+        counts[intent] = floor + delta
+
 
 class MemoryService:
     """Manages conversation memory and user context"""
@@ -24,8 +92,16 @@ class MemoryService:
     # Session timeout (inactive sessions)
     SESSION_TIMEOUT_HOURS = 2
     
+    # Instantiated per request; slots skip the per-instance dict
+    __slots__ = ("db", "_user_memory_cache")
+
     def __init__(self, db: Session):
         self.db = db
+        # Request-scoped memo for get_user_memory: the per-turn chain
+        # of memory writers reuses the row instead of re-selecting it.
+        # The service lives for one request, so it never outlasts the
+        # transaction it caches from.
+        self._user_memory_cache: Dict[str, UserMemory] = {}
     
     # ========================================================================
     # SHORT-TERM MEMORY (Conversation Sessions)
@@ -54,7 +130,7 @@ class MemoryService:
         
         return session
     
-    def add_message(
+    def stage_message(
         self,
         session_id: str,
         role: MessageRole,
@@ -62,35 +138,116 @@ class MemoryService:
         intent: Optional[str] = None,
         entities: Optional[Dict] = None
     ) -> Message:
-        """Add a message to the conversation"""
+        """
+        Stage a message on the session without committing.
+        Caller is responsible for committing (e.g. via get_db on exit),
+        so a full chat turn can be persisted in a single transaction.
+        """
         message = Message(
             session_id=session_id,
             role=role,
             content=content,
             intent=intent,
             entities=entities,
-            token_count=len(content.split())  # Rough estimate
+            token_count=_estimate_tokens(content) if content else 0
         )
-        
+
         self.db.add(message)
+
+        # Maintain the denormalized session stats with one targeted
+        # UPDATE - no session SELECT, and the counter increment is
+        # atomic under concurrent writers. COALESCE keeps the title
+        # once set, so only the first user message names the session.
+        now = datetime.utcnow()
+        values = {
+            "last_activity": now,
+            "last_message_at": now,
+            "message_count": ConversationSession.message_count + 1
+        }
+        if role == MessageRole.USER:
+            title = content[:50] + "..." if len(content) > 50 else content
+            values["title"] = func.coalesce(ConversationSession.title, title)
+        if intent:
+            values["intent_histogram"] = _bump_histogram({intent: 1})
+
+        self.db.execute(
+            update(ConversationSession)
+            .where(ConversationSession.session_id == session_id)
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+
+        return message
+
+    def add_message(
+        self,
+        session_id: str,
+        role: MessageRole,
+        content: str,
+        intent: Optional[str] = None,
+        entities: Optional[Dict] = None
+    ) -> Message:
+        """Add a message to the conversation in a single commit"""
+        message = self.stage_message(session_id, role, content, intent, entities)
         self.db.commit()
         self.db.refresh(message)
-        
-        # Update session activity
-        session = self.db.query(ConversationSession).filter(
-            ConversationSession.session_id == session_id
-        ).first()
-        if session:
-            session.last_activity = datetime.utcnow()
-            
-            # Set title from first user message if not set
-            if not session.title and role == MessageRole.USER:
-                session.title = content[:50] + "..." if len(content) > 50 else content
-            
-            self.db.commit()
-        
         return message
     
+    def bulk_add_messages(self, messages: List[Dict[str, Any]]) -> int:
+        """
+        Insert many messages (history import/replay) in one shot.
+
+        One executemany INSERT plus one counter UPDATE per touched
+        session, under a single commit - instead of an add_message
+        round trip and fsync per row. Each dict takes the same fields
+        as add_message (session_id, role, content, optional
+        intent/entities). Returns the number of rows inserted.
+        """
+        if not messages:
+            return 0
+
+        records = []
+        per_session: Dict[str, int] = {}
+        per_session_intents: Dict[str, Dict[str, int]] = {}
+        for msg in messages:
+            content = msg.get("content", "")
+            session_id = msg["session_id"]
+            intent = msg.get("intent")
+            records.append({
+                "session_id": session_id,
+                "role": msg["role"],
+                "content": content,
+                "intent": intent,
+                "entities": msg.get("entities"),
+                "token_count": _estimate_tokens(content) if content else 0
+            })
+            per_session[session_id] = per_session.get(session_id, 0) + 1
+            if intent:
+                deltas = per_session_intents.setdefault(session_id, {})
+                deltas[intent] = deltas.get(intent, 0) + 1
+
+        self.db.execute(insert(Message), records)
+
+        # Keep the denormalized session stats in step
+        now = datetime.utcnow()
+        for session_id, count in per_session.items():
+            values = {
+                "message_count": ConversationSession.message_count + count,
+                "last_activity": now,
+                "last_message_at": now
+            }
+            if session_id in per_session_intents:
+                values["intent_histogram"] = _bump_histogram(per_session_intents[session_id])
+            self.db.execute(
+                update(ConversationSession)
+                .where(ConversationSession.session_id == session_id)
+                .values(**values)
+                .execution_options(synchronize_session=False)
+            )
+
+        self.db.commit()
+        return len(records)
+
     def get_recent_messages(
         self,
         session_id: str,
@@ -112,7 +269,7 @@ class MemoryService:
         
         return [
             {
-                "role": msg.role.value,
+                "role": _ROLE_VALUE[msg.role],
                 "content": msg.content
             }
             for msg in messages
@@ -127,34 +284,56 @@ class MemoryService:
         if session:
             session.is_active = False
             session.ended_at = datetime.utcnow()
-            
-            # Generate session summary for long-term memory
-            # This can be enhanced with LLM summarization
-            messages = self.get_recent_messages(session_id, limit=100)
-            
-            # Extract intents
-            intents = list(set([msg.intent for msg in messages if msg.intent]))
+
+            # Summarize from the denormalized stats maintained at
+            # insert time; no message scan needed
+            intents = list(session.intent_histogram or {})
             session.key_intents = intents
-            
+
             # Simple summary (can be replaced with LLM)
-            session.session_summary = f"Session with {len(messages)} messages about {', '.join(intents) if intents else 'general queries'}"
-            
+            session.session_summary = f"Session with {session.message_count} messages about {', '.join(intents) if intents else 'general queries'}"
+
             self.db.commit()
     
     def cleanup_old_sessions(self, user_id: str):
         """End inactive sessions"""
         timeout = datetime.utcnow() - timedelta(hours=self.SESSION_TIMEOUT_HOURS)
-        
-        old_sessions = self.db.query(ConversationSession).filter(
+
+        # Three columns only; ending a session never needs the full
+        # row, and the summary comes from the denormalized stats
+        # rather than a scan of messages. SKIP LOCKED claims each
+        # stale session for exactly one worker when several run
+        # cleanup concurrently, and the LIMIT bounds the work done per
+        # invocation; leftovers go to the next run.
+        stale = self.db.query(
+            ConversationSession.session_id,
+            ConversationSession.intent_histogram,
+            ConversationSession.message_count
+        ).filter(
             and_(
                 ConversationSession.user_id == user_id,
                 ConversationSession.is_active == True,
                 ConversationSession.last_activity < timeout
             )
-        ).all()
-        
-        for session in old_sessions:
-            self.end_session(session.session_id)
+        ).with_for_update(skip_locked=True).limit(100).all()
+
+        if not stale:
+            return
+
+        ended_at = datetime.utcnow()
+        mappings = []
+        for sid, histogram, count in stale:
+            intents = list(histogram or {})
+            mappings.append({
+                "session_id": sid,
+                "is_active": False,
+                "ended_at": ended_at,
+                "key_intents": intents,
+                "session_summary": f"Session with {count} messages about {', '.join(intents) if intents else 'general queries'}"
+            })
+
+        self.db.bulk_update_mappings(ConversationSession, mappings)
+        self.db.commit()
     
     # ========================================================================
     # LONG-TERM MEMORY (User Context)
@@ -162,16 +341,22 @@ class MemoryService:
     
     def get_user_memory(self, user_id: str) -> Optional[UserMemory]:
         """Get user's long-term memory"""
-        return self.db.query(UserMemory).filter(
-            UserMemory.user_id == user_id
-        ).first()
-    
+        memory = self._user_memory_cache.get(user_id)
+        if memory is None:
+            memory = self.db.query(UserMemory).filter(
+                UserMemory.user_id == user_id
+            ).first()
+            if memory is not None:
+                self._user_memory_cache[user_id] = memory
+        return memory
+
     def create_user_memory(self, user_id: str) -> UserMemory:
         """Initialize user memory"""
         memory = UserMemory(user_id=user_id)
         self.db.add(memory)
         self.db.commit()
         self.db.refresh(memory)
+        self._user_memory_cache[user_id] = memory
         return memory
     
     def get_or_create_user_memory(self, user_id: str) -> UserMemory:
@@ -196,15 +381,38 @@ class MemoryService:
         memory.updated_at = datetime.utcnow()
         self.db.commit()
     
+    def stage_entity(self, user_id: str, key: str, value: Any):
+        """Stage an entity on user's long-term memory without committing"""
+        memory = self.get_or_create_user_memory(user_id)
+
+        entities = dict(memory.entities or {})
+        entities[key] = value
+        memory.entities = entities
+        memory.updated_at = datetime.utcnow()
+
     def add_entity(self, user_id: str, key: str, value: Any):
         """Add an entity to user's long-term memory"""
+        self.stage_entity(user_id, key, value)
+        self.db.commit()
+
+    def stage_entities(self, user_id: str, new_entities: Dict[str, Any]):
+        """
+        Stage several entities with a single memory fetch and merge,
+        instead of one lookup per key
+        """
+        if not new_entities:
+            return
+
         memory = self.get_or_create_user_memory(user_id)
-        
-        entities = memory.entities or {}
-        entities[key] = value
+
+        entities = dict(memory.entities or {})
+        entities.update(new_entities)
         memory.entities = entities
         memory.updated_at = datetime.utcnow()
-        
+
+    def add_entities(self, user_id: str, new_entities: Dict[str, Any]):
+        """Add several entities to user's long-term memory in one commit"""
+        self.stage_entities(user_id, new_entities)
         self.db.commit()
     
     def get_entity(self, user_id: str, key: str) -> Optional[Any]:
@@ -214,14 +422,56 @@ class MemoryService:
             return memory.entities.get(key)
         return None
     
-    def track_intent(self, user_id: str, intent: str):
-        """Track user's frequent intents"""
+    def stage_memory_deltas(
+        self,
+        user_id: str,
+        intents: Optional[Dict[str, int]] = None,
+        entities: Optional[Dict[str, Any]] = None
+    ):
+        """
+        Stage a turn's worth of intent counts and entities with one
+        memory fetch and one row rewrite, instead of a lookup (and, via
+        the non-staging wrappers, a commit) per key.
+        """
+        if not intents and not entities:
+            return
+
         memory = self.get_or_create_user_memory(user_id)
-        
-        frequent_intents = memory.frequent_intents or {}
-        frequent_intents[intent] = frequent_intents.get(intent, 0) + 1
+
+        if intents:
+            frequent_intents = dict(memory.frequent_intents or {})
+            for intent, count in intents.items():
+                _count_intent(frequent_intents, intent, count)
+            memory.frequent_intents = frequent_intents
+
+        if entities:
+            merged = dict(memory.entities or {})
+            merged.update(entities)
+            memory.entities = merged
+
+        memory.updated_at = datetime.utcnow()
+
+    def apply_memory_deltas(
+        self,
+        user_id: str,
+        intents: Optional[Dict[str, int]] = None,
+        entities: Optional[Dict[str, Any]] = None
+    ):
+        """Apply intent and entity deltas under a single commit"""
+        self.stage_memory_deltas(user_id, intents, entities)
+        self.db.commit()
+
+    def stage_intent(self, user_id: str, intent: str):
+        """Stage an intent count update without committing"""
+        memory = self.get_or_create_user_memory(user_id)
+
+        frequent_intents = dict(memory.frequent_intents or {})
+        _count_intent(frequent_intents, intent)
         memory.frequent_intents = frequent_intents
-        
+
+    def track_intent(self, user_id: str, intent: str):
+        """Track user's frequent intents"""
+        self.stage_intent(user_id, intent)
         self.db.commit()
     
     def update_profile_summary(self, user_id: str, llm_summary: str):
@@ -255,18 +505,44 @@ class MemoryService:
     # CONTEXT RETRIEVAL (for LLM)
     # ========================================================================
     
-    def get_full_context(self, user_id: str, session_id: str) -> Dict[str, Any]:
+    def get_full_context(
+        self,
+        user_id: str,
+        session_id: str,
+        session: Optional[ConversationSession] = None
+    ) -> Dict[str, Any]:
         """
         Get complete context for LLM:
         - Short-term: Recent conversation
         - Long-term: User profile and preferences
+
+        Pass the session object (e.g. from get_or_create_session) to
+        skip the activity-stamp lookup; a cache miss then costs exactly
+        the two data queries, back-to-back in one transaction.
         """
+        # The activity stamp decides cacheability; a hit replaces the
+        # message-window and UserMemory queries
+        if session is None:
+            session = self.db.query(ConversationSession.last_activity).filter(
+                ConversationSession.session_id == session_id
+            ).first()
+        cache_key = None
+        if session and session.last_activity:
+            cache_key = (user_id, session_id, session.last_activity)
+            hit = _CONTEXT_CACHE.get(cache_key)
+            if hit is not None:
+                context, stored_at = hit
+                if time.monotonic() - stored_at < _CONTEXT_CACHE_TTL:
+                    _CONTEXT_CACHE.move_to_end(cache_key)
+                    return context
+                del _CONTEXT_CACHE[cache_key]
+
         # Short-term memory
         recent_messages = self.get_session_history(session_id)
-        
+
         # Long-term memory
         user_memory = self.get_user_memory(user_id)
-        
+
         context = {
             "conversation_history": recent_messages,
             "user_profile": None,
@@ -290,13 +566,41 @@ class MemoryService:
                 "has_capital_gains": user_memory.has_capital_gains,
                 "has_house_property": user_memory.has_house_property
             }
-        
+
+        if cache_key is not None:
+            _CONTEXT_CACHE[cache_key] = (context, time.monotonic())
+            _CONTEXT_CACHE.move_to_end(cache_key)
+            while len(_CONTEXT_CACHE) > _CONTEXT_CACHE_MAX:
+                _CONTEXT_CACHE.popitem(last=False)
+
         return context
     
+    def get_context_bundle(
+        self,
+        user_id: str,
+        session_id: str,
+        session: Optional[ConversationSession] = None
+    ) -> Dict[str, Any]:
+        """
+        Get the full context and its text summary from one set of queries.
+        Callers that need both should use this instead of calling
+        get_full_context and get_context_summary back to back, which
+        would hit the same tables twice.
+        """
+        context = self.get_full_context(user_id, session_id, session=session)
+        return {
+            "context": context,
+            "summary": self.summarize_context(context)
+        }
+
     def get_context_summary(self, user_id: str, session_id: str) -> str:
         """Get a text summary of context for system prompt"""
         context = self.get_full_context(user_id, session_id)
-        
+        return self.summarize_context(context)
+
+    @staticmethod
+    def summarize_context(context: Dict[str, Any]) -> str:
+        """Build the system-prompt summary from an already-fetched context"""
         summary_parts = []
         
         if context["user_profile"]:
@@ -331,7 +635,22 @@ class MemoryService:
             query = query.filter(ConversationSession.is_active == True)
         
         return query.order_by(desc(ConversationSession.last_activity)).all()
-    
+
+    def get_user_sessions_with_counts(self, user_id: str) -> List[tuple]:
+        """Get all user sessions with their message counts.
+
+        Returns (session, message_count) pairs read straight off the
+        denormalized counter, so listing sessions touches only the
+        sessions table.
+        """
+        sessions = (
+            self.db.query(ConversationSession)
+            .filter(ConversationSession.user_id == user_id)
+            .order_by(desc(ConversationSession.last_activity))
+            .all()
+        )
+        return [(session, session.message_count) for session in sessions]
+
     def delete_session(self, session_id: str):
         """Delete a session and its messages"""
         session = self.db.query(ConversationSession).filter(
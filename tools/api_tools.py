@@ -1,9 +1,21 @@
 from crewai.tools import tool
+import orjson
 import requests
-import json
+from requests.adapters import HTTPAdapter, Retry
 
 API_BASE = "http://localhost:8000/api"
 
+# One pooled session for all tool calls: connections are reused across
+# invocations instead of paying a TCP (+TLS) handshake per call, with a
+# short retry on transient connection errors
+_SESSION = requests.Session()
+_SESSION.mount("http://", HTTPAdapter(
+    pool_connections=8,
+    pool_maxsize=32,
+    max_retries=Retry(total=2, backoff_factor=0.1)
+))
+_TIMEOUT = 5
+
 @tool("Trigger Auto ITR Filing")
 def trigger_auto_itr_filing(user_id: str, pan: str, assessment_year: str, itr_type: str) -> str:
     """
@@ -21,7 +33,7 @@ def trigger_auto_itr_filing(user_id: str, pan: str, assessment_year: str, itr_ty
             "assessment_year": assessment_year,
             "itr_type": itr_type
         }
-        response = requests.post(f"{API_BASE}/itr/file-automatically", params=params)
+        response = _SESSION.post(f"{API_BASE}/itr/file-automatically", params=params, timeout=_TIMEOUT)
         response.raise_for_status()
         return f"✅ ITR Filing Initiated! Response: {response.json()}"
     except Exception as e:
@@ -31,7 +43,7 @@ def trigger_auto_itr_filing(user_id: str, pan: str, assessment_year: str, itr_ty
 def get_itr_status(filing_id: str) -> str:
     """Checks the status of an ITR filing."""
     try:
-        response = requests.get(f"{API_BASE}/itr/status/{filing_id}")
+        response = _SESSION.get(f"{API_BASE}/itr/status/{filing_id}", timeout=_TIMEOUT)
         response.raise_for_status()
         return str(response.json())
     except Exception as e:
@@ -41,7 +53,7 @@ def get_itr_status(filing_id: str) -> str:
 def get_portfolio(user_id: str) -> str:
     """Gets the capital gains portfolio summary for a user."""
     try:
-        response = requests.get(f"{API_BASE}/capital-gains/portfolio/{user_id}")
+        response = _SESSION.get(f"{API_BASE}/capital-gains/portfolio/{user_id}", timeout=_TIMEOUT)
         response.raise_for_status()
         return str(response.json())
     except Exception as e:
@@ -63,7 +75,14 @@ def add_transaction(user_id: str, asset_type: str, transaction_type: str, purcha
             "quantity": quantity,
             "asset_name": asset_name
         }
-        response = requests.post(f"{API_BASE}/capital-gains/transaction", json=data)
+        # Serialize once with orjson instead of letting requests run
+        # the body through stdlib json
+        response = _SESSION.post(
+            f"{API_BASE}/capital-gains/transaction",
+            data=orjson.dumps(data),
+            headers={"Content-Type": "application/json"},
+            timeout=_TIMEOUT
+        )
         response.raise_for_status()
         return f"✅ Transaction added: {response.json()}"
     except Exception as e:
@@ -83,7 +102,7 @@ def request_document(user_id: str, document_type: str, reason: str) -> str:
 def delete_transaction(txn_id: str) -> str:
     """Deletes a capital gains transaction."""
     try:
-        response = requests.delete(f"{API_BASE}/capital-gains/transaction/{txn_id}")
+        response = _SESSION.delete(f"{API_BASE}/capital-gains/transaction/{txn_id}", timeout=_TIMEOUT)
         response.raise_for_status()
         return "✅ Transaction deleted."
     except Exception as e:
@@ -93,7 +112,7 @@ def delete_transaction(txn_id: str) -> str:
 def delete_filing(filing_id: str) -> str:
     """Deletes an ITR filing."""
     try:
-        response = requests.delete(f"{API_BASE}/itr/filing/{filing_id}")
+        response = _SESSION.delete(f"{API_BASE}/itr/filing/{filing_id}", timeout=_TIMEOUT)
         response.raise_for_status()
         return "✅ Filing deleted."
     except Exception as e: